@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Benchmark suite for descriptor generation. For each plugin (flavor) and number of VNFs, it measures
+the stages of generating descriptors in memory (no disk I/O):
+
+- template_load: parsing the default VNFD and NSD templates (cold template cache)
+- vnfds: generating all VNFDs from the cached templates (per-VNF time is reported as well)
+- nsd: generating the NSD with its virtual links and forwarding graph for all VNFs
+- serialize: serializing the NSD and all VNFDs as yml
+
+Results are printed and can be saved as JSON (--output) and compared to a previous run (--compare),
+eg, to catch regressions between commits. With --compare, the exit code is 1 if a stage got slower
+than --threshold times the baseline.
+
+Usage: python benchmarks/bench_descriptorgen.py [--vnfs 1 100 10000] [--repeat 5] [--flavors tango osm]
+                                                [--output results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import subprocess
+from tngsdk import cli
+from tngsdk.descriptorgen import descriptorgen, templates
+
+STAGES = ['template_load', 'vnfds', 'nsd', 'serialize']
+
+
+# run func repeat times; return the best and median duration in ms and the result of the last run
+def measure(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return durations[0], durations[len(durations) // 2], result
+
+
+# cold load of the templates of a flavor (clears the per-process template cache before each run)
+def load_templates(flavor):
+    templates.load.cache_clear()
+    return [templates.load('{}_default_{}.yml'.format(flavor, d)) for d in ['vnfd', 'nsd']]
+
+
+def bench_flavor(flavor, num_vnfs, repeat, log):
+    plugin = descriptorgen.get_plugin(flavor)
+    args = cli.parse_args(['--vnfs', str(num_vnfs)])
+    results = []
+
+    def add(stage, timing):
+        best, median, result = timing
+        results.append({'flavor': flavor, 'vnfs': num_vnfs, 'stage': stage,
+                        'best_ms': round(best, 4), 'median_ms': round(median, 4),
+                        'per_vnf_us': round(best * 1000 / num_vnfs, 3) if stage != 'template_load' else None})
+        return result
+
+    add('template_load', measure(lambda: load_templates(flavor), repeat))
+    vnfds = add('vnfds', measure(lambda: [plugin.generate_vnfd(args, i, log) for i in range(num_vnfs)], repeat))
+    refs = [plugin.vnf_ref(vnfd) for vnfd in vnfds]
+    nsd = add('nsd', measure(lambda: plugin.generate_nsd(args, refs, log), repeat))
+    add('serialize', measure(lambda: [descriptorgen.dumps_descriptor(d) for d in [nsd] + vnfds], repeat))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# compare results with a baseline (same flavor, vnfs, stage); returns the list of regressions
+def compare(results, baseline, threshold):
+    base = {(r['flavor'], r['vnfs'], r['stage']): r['best_ms'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        base_ms = base.get((r['flavor'], r['vnfs'], r['stage']))
+        if base_ms is None:
+            continue
+        ratio = r['best_ms'] / base_ms if base_ms > 0 else 1
+        print('{:>6} {:>6} VNFs {:<14} {:>10.2f}ms -> {:>10.2f}ms ({:.2f}x)'
+              .format(r['flavor'], r['vnfs'], r['stage'], base_ms, r['best_ms'], ratio))
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for descriptor generation")
+    parser.add_argument('--vnfs', type=int, nargs='+', default=[1, 100, 10000], help='numbers of VNFs')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions per measurement (best is compared)')
+    parser.add_argument('--flavors', nargs='+', default=list(descriptorgen.PLUGINS), help='plugins to benchmark')
+    parser.add_argument('--output', help='save the results as JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='max. allowed slowdown compared to the baseline (best time ratio)')
+    args = parser.parse_args()
+    log = logging.getLogger(__name__)
+    logging.disable(logging.WARNING)
+
+    results = []
+    for num_vnfs in args.vnfs:
+        for flavor in args.flavors:
+            for r in bench_flavor(flavor, num_vnfs, args.repeat, log):
+                print('{:>6} {:>6} VNFs {:<14} best {:>10.2f}ms  median {:>10.2f}ms  {}'
+                      .format(r['flavor'], r['vnfs'], r['stage'], r['best_ms'], r['median_ms'],
+                              '{:.2f}us/VNF'.format(r['per_vnf_us']) if r['per_vnf_us'] is not None else ''))
+                results.append(r)
+
+    report = {'commit': git_commit(), 'python': platform.python_version(), 'repeat': args.repeat,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Saved results to {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('{} stage(s) slower than {}x the baseline'.format(len(regressions), args.threshold))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Benchmark for adding many files to a project.
+Compares adding files one by one (each add rewrites project.yml) with
+adding them in batch mode (project.yml is written once at the end).
+
+Usage: python benchmarks/bench_project.py [--files 10000] [--skip-unbatched]
+Note: unbatched adding is quadratic in the number of files and takes very long for 10k files.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import argparse
+import logging
+from tngsdk.project.workspace import Workspace, create_workspace
+from tngsdk.project.project import Project
+
+
+# create a project with the given number of (empty) text files
+def setup_project(ws, root, num_files):
+    project = Project(ws, root)
+    os.makedirs(root)
+    project._write_prj_yml()
+    for i in range(num_files):
+        with open(os.path.join(root, 'file{}.txt'.format(i)), 'w') as f:
+            f.write('')
+    return project
+
+
+# add each file separately (manifest written after every file)
+def add_unbatched(project, num_files):
+    for i in range(num_files):
+        project.add_file(os.path.join(project.project_root, 'file{}.txt'.format(i)))
+
+
+# add all files in a single batch (manifest written once)
+def add_batched(project, num_files):
+    with project.batch():
+        for i in range(num_files):
+            project.add_file(os.path.join(project.project_root, 'file{}.txt'.format(i)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adding files to a project")
+    parser.add_argument('--files', type=int, default=10000, help='number of files to add')
+    parser.add_argument('--skip-unbatched', action='store_true', help='only benchmark batched adding')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        ws_root = os.path.join(tmp, 'ws')
+        create_workspace(ws_root)
+        ws = Workspace.load_workspace(ws_root)
+
+        modes = [('unbatched', add_unbatched), ('batched', add_batched)]
+        if args.skip_unbatched:
+            modes = modes[1:]
+        for name, add in modes:
+            project = setup_project(ws, os.path.join(tmp, name), args.files)
+            start = time.perf_counter()
+            add(project, args.files)
+            duration = time.perf_counter() - start
+            print('{}: added {} files in {:.3f}s'.format(name, args.files, duration))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -69,7 +69,8 @@ def parse_args(input_args=None):
                         action="store_true")
 
     parser.add_argument("--add",
-                        help="Add file to project",
+                        help="Add file(s) to project",
+                        nargs="+",
                         required=False,
                         default=None)
 
@@ -78,8 +79,22 @@ def parse_args(input_args=None):
                         required=False,
                         default=None)
 
+    parser.add_argument("-j", "--jobs",
+                        help="Number of parallel workers for detecting MIME types when adding many files "
+                        "and for saving descriptors with --stream",
+                        type=int,
+                        required=False,
+                        default=1)
+
+    parser.add_argument("--pool",
+                        help="Use a thread or process pool for parallel MIME type detection (only with --jobs)",
+                        choices=["thread", "process"],
+                        required=False,
+                        default="thread")
+
     parser.add_argument("--remove",
-                        help="Remove file from project",
+                        help="Remove file(s) from project",
+                        nargs="+",
                         required=False,
                         default=None)
 
@@ -117,6 +132,21 @@ def parse_args(input_args=None):
     parser.add_argument('--image_types',
                         help='list of VNF image types (default: docker)',
                         nargs='*', required=False, default='')
+    parser.add_argument('--flavors',
+                        help='list of descriptor flavors to generate (default: all, eg, tango osm)',
+                        nargs='+', required=False, default=None)
+    parser.add_argument('--spec',
+                        help='YAML or CSV file listing multiple services to generate at once '
+                        '(descriptors of each service are saved in a subfolder of -o)',
+                        required=False, default=None)
+    parser.add_argument('--stream',
+                        help='stream VNFDs to disk while generating them (for services with many VNFs); '
+                        'use with -j to save them in parallel processes',
+                        required=False, action='store_true')
+    parser.add_argument('--dedup',
+                        help='VNFs with identical image name and type share one VNFD, '
+                        'which is referenced multiple times in the NSD',
+                        required=False, action='store_true')
 
     # service management
     parser.add_argument("-s", "--service",
@@ -145,6 +175,63 @@ def parse_args(input_args=None):
                         default=5098,
                         dest="service_port")
 
+    parser.add_argument("--workers",
+                        help="Number of worker processes of the REST API when in service mode.",
+                        required=False,
+                        type=int,
+                        default=1,
+                        dest="workers")
+
+    parser.add_argument("--threads",
+                        help="Number of threads per worker process of the REST API when in service mode.",
+                        required=False,
+                        type=int,
+                        default=4,
+                        dest="threads")
+
+    parser.add_argument("--keep-alive",
+                        help="Seconds to keep idle HTTP connections open when in service mode (with --threads > 1).",
+                        required=False,
+                        type=int,
+                        default=5,
+                        dest="keep_alive")
+
+    parser.add_argument("--graceful-timeout",
+                        help="Seconds to finish running requests when stopping the service.",
+                        required=False,
+                        type=int,
+                        default=30,
+                        dest="graceful_timeout")
+
+    parser.add_argument("--worker-timeout",
+                        help="Seconds after which unresponsive worker processes are restarted "
+                             "(with --threads 1 also requests taking longer, eg, large uploads).",
+                        required=False,
+                        type=int,
+                        default=60,
+                        dest="worker_timeout")
+
+    parser.add_argument("--package-workers",
+                        help="Number of packaging processes per worker process when in service mode.",
+                        required=False,
+                        type=int,
+                        default=2,
+                        dest="package_workers")
+
+    parser.add_argument("--package-queue",
+                        help="Max. number of waiting packaging jobs per worker process (more are rejected).",
+                        required=False,
+                        type=int,
+                        default=8,
+                        dest="package_queue")
+
+    parser.add_argument("--max-upload-size",
+                        help="Max. size in MB of each file uploaded to the service. Default: unlimited.",
+                        required=False,
+                        type=int,
+                        default=None,
+                        dest="max_upload_size")
+
     if input_args is None:
         input_args = sys.argv[1:]
     return parser.parse_args(input_args)
@@ -169,16 +256,18 @@ def dispatch(args):
     prj_root = os.path.expanduser(args.project)
 
     if args.add:
-        # load project and add file to project.yml
-        log.debug("Attempting to add file {}".format(args.add))
-        proj = Project.load_project(prj_root, ws)
-        proj.add_file(args.add, type=args.type)
+        # load project and add files to project.yml (written once for all files)
+        log.debug("Attempting to add file(s) {}".format(args.add))
+        proj = Project.load_project(prj_root, ws, jobs=args.jobs, pool=args.pool)
+        proj.add_files(args.add, type=args.type)
 
     elif args.remove:
-        # load project and remove file from project.yml
-        log.debug("Attempting to remove file {}".format(args.remove))
+        # load project and remove files from project.yml (written once for all files)
+        log.debug("Attempting to remove file(s) {}".format(args.remove))
         proj = Project.load_project(prj_root, ws)
-        proj.remove_file(args.remove)
+        with proj.batch():
+            for f in args.remove:
+                proj.remove_file(f)
 
     elif args.status:
         # load project and show status
@@ -187,7 +276,7 @@ def dispatch(args):
         proj.status()
 
     elif args.translate:
-        proj = Project.load_project(prj_root, ws, translate=True)
+        proj = Project.load_project(prj_root, ws, translate=True, jobs=args.jobs, pool=args.pool)
         proj.translate()
 
     else:
@@ -201,7 +290,7 @@ def dispatch(args):
             log.info("Number of VNFs and VNF image types don't match."
                      " Using default image types if necessary.")
 
-        proj = Project(ws, prj_root)
+        proj = Project(ws, prj_root, jobs=args.jobs, pool=args.pool)
         proj.create_prj(args)
         log.debug("Project created.")
 
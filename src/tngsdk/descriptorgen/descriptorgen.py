@@ -35,28 +35,220 @@
 
 import oyaml as yaml        # ordered yaml to avoid reordering of descriptors
 import os
+import csv
 import logging
+import io
+import argparse
+import zipfile
+import importlib
+import multiprocessing
 import coloredlogs
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from tngsdk import cli
-from tngsdk.descriptorgen.plugins import tango, osm
 
 log = logging.getLogger(__name__)
 
+# descriptorgen plugin module of each flavor (imported only when used)
+# plugins provide generate_descriptors, generate_vnfd, vnf_ref and generate_nsd (see plugins/tango.py)
+PLUGINS = OrderedDict([
+    ('tango', 'tngsdk.descriptorgen.plugins.tango'),
+    ('osm', 'tngsdk.descriptorgen.plugins.osm')
+])
+
+# fields of a service in a spec file for batch generation (--spec); all but name are optional
+SPEC_FIELDS = ['name', 'author', 'vendor', 'description', 'vnfs', 'image_names', 'image_types', 'flavors', 'dedup',
+               'output']
+
+# min. number of VNFs for generating multiple flavors in parallel processes
+# for smaller services, starting the processes takes longer than generating the descriptors
+PARALLEL_MIN_VNFS = 50
+# flavors are also generated in parallel when creating projects via the REST API, ie, inside request threads
+# of a multi-threaded server, which must not be forked (the children could deadlock on the other threads' locks)
+FLAVOR_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+# add a new descriptor flavor, which is then generated by default
+def register_plugin(flavor, module):
+    PLUGINS[flavor] = module
+
+
+def get_plugin(flavor):
+    return importlib.import_module(PLUGINS[flavor])
+
+
+# dump a descriptor as yml file unless the file already has exactly this content
+# unchanged files are not rewritten to keep their mtime; returns True if the file was written
+def dump_descriptor(descriptor, outfile):
+    content = dumps_descriptor(descriptor)
+    try:
+        if os.path.getsize(outfile) == len(content):
+            with open(outfile, 'rb') as f:
+                if f.read() == content:
+                    return False
+    except OSError:
+        pass
+    with open(outfile, 'wb') as f:
+        f.write(content)
+    return True
+
+
+# serialize a descriptor as yml (same content as the file written by dump_descriptor)
+def dumps_descriptor(descriptor):
+    return yaml.dump(descriptor, default_flow_style=False).encode('utf-8')
+
 
 # save the generated descriptors in the specified folder; add a prefix for each flavor
+# returns the number of written and skipped (unchanged) files
 def save_descriptors(nsd, vnfds, flavor, folder='.'):
     # create dir if it doesn't exist
     if not os.path.exists(folder):
         os.makedirs(folder)
 
     # dump generated nsd and vnfds
-    outfile = os.path.join(folder, '{}_nsd.yml'.format(flavor))
-    with open(outfile, 'w', newline='') as f:
-        yaml.dump(nsd, f, default_flow_style=False)
+    written = dump_descriptor(nsd, os.path.join(folder, '{}_nsd.yml'.format(flavor)))
     for i, vnf in enumerate(vnfds):
-        outfile = os.path.join(folder, '{}_vnfd{}.yml'.format(flavor, i))
-        with open(outfile, 'w', newline='') as f:
-            yaml.dump(vnf, f, default_flow_style=False)
+        written += dump_descriptor(vnf, os.path.join(folder, '{}_vnfd{}.yml'.format(flavor, i)))
+    skipped = len(vnfds) + 1 - written
+    log.info('Saved {} descriptors at {}: {} written, {} unchanged'.format(flavor, folder, written, skipped))
+    return written, skipped
+
+
+# dedup mode: VNFs with identical image name and type share the VNFD of the first of these VNFs
+# return the index of the VNFD used by each VNF (without dedup, each VNF has its own VNFD)
+def vnfd_indices(args):
+    num_vnfs = int(args.vnfs)
+    if not args.dedup:
+        return list(range(num_vnfs))
+    first = {}
+    indices = []
+    for i in range(num_vnfs):
+        image_name = args.image_names[i] if i < len(args.image_names) else None
+        image_type = args.image_types[i] if i < len(args.image_types) else None
+        indices.append(first.setdefault((image_name, image_type), i))
+    return indices
+
+
+# generate and save the VNFDs with the given indices one by one, such that only one VNFD is in memory
+# return the references to the VNFDs needed for generating the NSD and the number of written (changed) files
+# (can be used in a process pool)
+def save_vnfds(flavor, args, indices, folder='.', module=None):
+    plugin = importlib.import_module(module or PLUGINS[flavor])
+    vnf_refs = []
+    written = 0
+    for i in indices:
+        vnfd = plugin.generate_vnfd(args, i, log)
+        written += dump_descriptor(vnfd, os.path.join(folder, '{}_vnfd{}.yml'.format(flavor, i)))
+        vnf_refs.append(plugin.vnf_ref(vnfd))
+    return vnf_refs, written
+
+
+# large-scale mode: stream VNFDs to disk while generating them instead of keeping all of them in memory
+# with jobs > 1, chunks of VNFDs are generated and saved in parallel worker processes
+# with dedup, only one VNFD is saved per distinct image, which is referenced by multiple VNFs in the NSD
+def stream_descriptors(flavor, args, folder='.', jobs=1):
+    os.makedirs(folder, exist_ok=True)
+    indices = vnfd_indices(args)
+    unique = sorted(set(indices))
+    if jobs > 1 and len(unique) > 1:
+        chunk_size = -(-len(unique) // (jobs * 4))     # ceil: 4 chunks per worker for load balancing
+        log.debug("Saving {} VNFDs in chunks of {} with {} processes".format(len(unique), chunk_size, jobs))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(save_vnfds, flavor, args, unique[start:start + chunk_size], folder,
+                                       PLUGINS[flavor])
+                       for start in range(0, len(unique), chunk_size)]
+            results = [future.result() for future in futures]
+        refs = [ref for chunk_refs, _ in results for ref in chunk_refs]
+        written = sum(chunk_written for _, chunk_written in results)
+    else:
+        refs, written = save_vnfds(flavor, args, unique, folder)
+    if len(unique) < len(indices):
+        log.debug("{} VNFs share {} VNFDs".format(len(indices), len(unique)))
+
+    refs = dict(zip(unique, refs))
+    nsd = get_plugin(flavor).generate_nsd(args, [refs[i] for i in indices], log)
+    written += dump_descriptor(nsd, os.path.join(folder, '{}_nsd.yml'.format(flavor)))
+    skipped = len(unique) + 1 - written
+    log.info('Generated {} descriptors at {}: {} written, {} unchanged'.format(flavor, folder, written, skipped))
+    return written, skipped
+
+
+# generate and save the descriptors of one flavor (can be used in a process pool)
+# dedup uses the streaming path, which already generates VNFDs by index
+# returns the number of written and skipped (unchanged) files
+def generate_flavor(flavor, args, module=None):
+    if args.stream or args.dedup:
+        return stream_descriptors(flavor, args, args.out_path, args.jobs if args.stream else 1)
+    plugin = importlib.import_module(module or PLUGINS[flavor])
+    descriptors = plugin.generate_descriptors(args, log)
+    return save_descriptors(descriptors['nsd'], descriptors['vnfds'], flavor, args.out_path)
+
+
+# read a spec file (yml or csv) listing multiple services; returns a list with a dict per service
+# yml: list of services (or dict with key 'services'); csv: header with field names,
+# lists (image_names, image_types, flavors) separated by spaces, dedup as true/false
+def read_spec(spec_file):
+    if os.path.splitext(spec_file)[1] == '.csv':
+        services = []
+        with open(spec_file, newline='') as f:
+            for row in csv.DictReader(f):
+                service = {k: v for k, v in row.items() if v}
+                for key in ['image_names', 'image_types', 'flavors']:
+                    if key in service:
+                        service[key] = service[key].split()
+                if 'dedup' in service:
+                    service['dedup'] = service['dedup'].lower() in ['1', 'true', 'yes']
+                services.append(service)
+        return services
+
+    with open(spec_file, 'r') as f:
+        spec = yaml.load(f, Loader=yaml.FullLoader)
+    if isinstance(spec, dict):
+        spec = spec.get('services')
+    return spec or []
+
+
+# create the generation args of a service in a spec file; unspecified fields are taken from the given args
+# descriptors are saved in a subfolder (service name or output) of the output path
+def service_args(args, service):
+    unknown = [k for k in service if k not in SPEC_FIELDS]
+    if unknown or 'name' not in service:
+        raise ValueError("Invalid service {} in spec: needs 'name'; allowed fields: {}".format(service, SPEC_FIELDS))
+    srv_args = argparse.Namespace(**vars(args))
+    srv_args.spec = None
+    for k, v in service.items():
+        if k != 'output':
+            setattr(srv_args, k, v)
+    srv_args.vnfs = int(srv_args.vnfs)
+    if srv_args.flavors and not set(srv_args.flavors) <= set(PLUGINS):
+        raise ValueError("Unknown flavors {} of service {}. Available: {}"
+                         .format(srv_args.flavors, service['name'], list(PLUGINS)))
+    srv_args.out_path = os.path.join(args.out_path, str(service.get('output', service['name'])))
+    return srv_args
+
+
+# batch mode: generate the descriptors of all services in the spec file in a single process
+# (sharing the parsed templates) or distributed over multiple processes with --jobs
+def generate_batch(args):
+    try:
+        services = [service_args(args, s) for s in read_spec(args.spec)]
+    except (OSError, ValueError, yaml.YAMLError) as exc:
+        log.error("Could not read spec file {}: {}".format(args.spec, exc))
+        exit(1)
+
+    log.info("Generating descriptors for {} services in {}".format(len(services), args.spec))
+    if args.jobs > 1 and len(services) > 1:
+        # parallelize across services only; each service is generated sequentially inside its worker
+        for srv_args in services:
+            srv_args.jobs = 1
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [executor.submit(generate_service, srv_args, False) for srv_args in services]
+            for future in futures:
+                future.result()
+    else:
+        for srv_args in services:
+            generate_service(srv_args)
+    return services
 
 
 def generate(args=None):
@@ -68,17 +260,114 @@ def generate(args=None):
     else:
         coloredlogs.install(level='INFO')
 
+    if args.spec:
+        generate_batch(args)
+        return
+
     log.info("Generating descriptors with args {}".format(args))
+    generate_service(args)
+
+
+# by default, generate all flavors; --tango or --osm restrict it to one flavor
+def select_flavors(args):
+    if args.flavors:
+        return args.flavors
+    return [f for f in PLUGINS if not (args.tango and f != 'tango') and not (args.osm and f != 'osm')]
+
+
+# generate and save the descriptors of all requested flavors of a service
+# flavors are generated in parallel processes for larger services unless parallel=False
+# returns the total number of written and skipped (unchanged) files
+def generate_service(args, parallel=True):
+    flavors = select_flavors(args)
+    unknown = [f for f in flavors if f not in PLUGINS]
+    if unknown:
+        log.error("Unknown descriptor flavor(s) {}. Available: {}".format(unknown, list(PLUGINS)))
+        exit(1)
+
+    # generate and save descriptors of each flavor; flavors are independent and can be generated in parallel
+    # not if streaming with multiple jobs, which already uses a process pool per flavor
+    executor = None
+    if parallel and len(flavors) > 1 and int(args.vnfs) >= PARALLEL_MIN_VNFS \
+            and not (args.stream and args.jobs > 1):
+        executor = _flavor_pool(len(flavors))
+    if executor is not None:
+        log.debug("Generating flavors {} in parallel processes".format(flavors))
+        with executor:
+            futures = [executor.submit(generate_flavor, f, args, PLUGINS[f]) for f in flavors]
+            counts = [future.result() for future in futures]
+    else:
+        counts = [generate_flavor(flavor, args) for flavor in flavors]
+    # logged here as the worker processes do not log (not forked from this process)
+    written, skipped = sum(c[0] for c in counts), sum(c[1] for c in counts)
+    log.info("Saved descriptors of flavors {} at {}: {} written, {} unchanged"
+             .format(flavors, args.out_path, written, skipped))
+    return written, skipped
+
+
+# process pool for generating flavors in parallel or None if it cannot be started with FLAVOR_START_METHOD
+# (Python < 3.7: no mp_context), in which case flavors are generated sequentially instead of forking
+def _flavor_pool(max_workers):
+    try:
+        return ProcessPoolExecutor(max_workers=max_workers,
+                                   mp_context=multiprocessing.get_context(FLAVOR_START_METHOD))
+    except TypeError:
+        log.debug("Generating flavors sequentially: process pools without fork require Python 3.7+")
+        return None
+
+
+# generate the descriptors of one flavor in memory; returns an OrderedDict {file name: descriptor}
+# with the same file names as when saving them (see save_descriptors and stream_descriptors)
+def flavor_descriptors(flavor, args):
+    plugin = get_plugin(flavor)
+    indices = vnfd_indices(args)
+    vnfds = OrderedDict((i, plugin.generate_vnfd(args, i, log)) for i in sorted(set(indices)))
+    nsd = plugin.generate_nsd(args, [plugin.vnf_ref(vnfds[i]) for i in indices], log)
+
+    descriptors = OrderedDict([('{}_nsd.yml'.format(flavor), nsd)])
+    for i, vnfd in vnfds.items():
+        descriptors['{}_vnfd{}.yml'.format(flavor, i)] = vnfd
+    return descriptors
+
+
+# programmatic API: generate descriptors in memory without writing any files
+# kwargs are the descriptorgen CLI options, eg, generate_in_memory(vnfs=3, author='alice', flavors=['tango'])
+# returns an OrderedDict {file name: descriptor} of all requested flavors; raises ValueError for invalid options
+def generate_in_memory(**kwargs):
+    args = cli.parse_args([])
+    unknown = [k for k in kwargs if not hasattr(args, k)]
+    if unknown:
+        raise ValueError("Unknown descriptorgen options: {}".format(unknown))
+    for k, v in kwargs.items():
+        setattr(args, k, v)
+    args.vnfs = int(args.vnfs)
+    args.image_names = args.image_names or []
+    args.image_types = args.image_types or []
+
+    flavors = select_flavors(args)
+    unknown = [f for f in flavors if f not in PLUGINS]
+    if unknown:
+        raise ValueError("Unknown descriptor flavor(s) {}. Available: {}".format(unknown, list(PLUGINS)))
+
+    descriptors = OrderedDict()
+    for flavor in flavors:
+        descriptors.update(flavor_descriptors(flavor, args))
+    return descriptors
+
+
+# serialize in-memory descriptors (see generate_in_memory); returns an OrderedDict {file name: yml bytes}
+def serialize_descriptors(descriptors):
+    return OrderedDict((name, dumps_descriptor(d)) for name, d in descriptors.items())
 
-    # generate and save tango descriptors
-    if not args.osm:
-        descriptors = tango.generate_descriptors(args, log)
-        save_descriptors(descriptors['nsd'], descriptors['vnfds'], 'tango', args.out_path)
 
-    # generate and save osm descriptors
-    if not args.tango:
-        descriptors = osm.generate_descriptors(args, log)
-        save_descriptors(descriptors['nsd'], descriptors['vnfds'], 'osm', args.out_path)
+# pack in-memory descriptors into a zip archive; returns a file-like object positioned at the start
+def zip_descriptors(descriptors):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in serialize_descriptors(descriptors).items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
 
 
 if __name__ == '__main__':
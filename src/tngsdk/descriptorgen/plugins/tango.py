@@ -1,49 +1,57 @@
-import os
-import oyaml as yaml
-import copy
+from tngsdk.descriptorgen import templates
 
 
 # generate 5GTANGO descriptors from the provided high-level arguments
 def generate_descriptors(user_inputs, log):
-    # load default descriptors (relative to file location, not curr directory)
-    log.debug('Loading 5GTANGO default descriptors')
-    descriptor_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'default-descriptors')
-    with open(os.path.join(descriptor_dir, 'tango_default_nsd.yml')) as f:
-        tango_default_nsd = yaml.load(f, Loader=yaml.FullLoader)
-    with open(os.path.join(descriptor_dir, 'tango_default_vnfd.yml')) as f:
-        tango_default_vnfd = yaml.load(f, Loader=yaml.FullLoader)
-
     # generate VNFDs
     log.debug('Generating 5GTANGO VNFDs')
-    vnfds = []
-    tango_default_vnfd['author'] = user_inputs.author
-    tango_default_vnfd['vendor'] = user_inputs.vendor
-    for i in range(int(user_inputs.vnfs)):
-        vnfd = copy.deepcopy(tango_default_vnfd)
-        vnfd['name'] = 'default-vnf{}'.format(i)
-
-        # add VNF image name if available
-        if i < len(user_inputs.image_names):
-            log.debug("VNF {} image name: {}"
-                      .format(i, user_inputs.image_names[i]))
-            vnfd['virtual_deployment_units'][0]['vm_image'] = \
-                user_inputs.image_names[i]
-        else:
-            log.debug("Using default image name for VNF {}".format(i))
-        # add VNF image name if available
-        if i < len(user_inputs.image_types):
-            log.debug("VNF {} image type: {}"
-                      .format(i, user_inputs.image_types[i]))
-            vnfd['virtual_deployment_units'][0]['vm_image_format'] = \
-                user_inputs.image_types[i]
-        else:
-            log.debug("Using default image type for VNF {}".format(i))
-
-        vnfds.append(vnfd)
+    vnfds = [generate_vnfd(user_inputs, i, log) for i in range(int(user_inputs.vnfs))]
 
     # generate NSD
+    nsd = generate_nsd(user_inputs, [vnf_ref(vnfd) for vnfd in vnfds], log)
+
+    # create descriptor dictionary
+    descriptors = {'nsd': nsd, 'vnfds': vnfds}
+    log.info('Generated 5GTANGO descriptors at {}'.format(user_inputs.out_path))
+    return descriptors
+
+
+# generate the VNFD of the i-th VNF (copy of the default VNFD, parsed only once per process)
+def generate_vnfd(user_inputs, i, log):
+    vnfd = templates.get('tango_default_vnfd.yml')
+    vnfd['author'] = user_inputs.author
+    vnfd['vendor'] = user_inputs.vendor
+    vnfd['name'] = 'default-vnf{}'.format(i)
+
+    # add VNF image name if available
+    if i < len(user_inputs.image_names):
+        log.debug("VNF {} image name: {}"
+                  .format(i, user_inputs.image_names[i]))
+        vnfd['virtual_deployment_units'][0]['vm_image'] = \
+            user_inputs.image_names[i]
+    else:
+        log.debug("Using default image name for VNF {}".format(i))
+    # add VNF image name if available
+    if i < len(user_inputs.image_types):
+        log.debug("VNF {} image type: {}"
+                  .format(i, user_inputs.image_types[i]))
+        vnfd['virtual_deployment_units'][0]['vm_image_format'] = \
+            user_inputs.image_types[i]
+    else:
+        log.debug("Using default image type for VNF {}".format(i))
+
+    return vnfd
+
+
+# return the fields of a VNFD that are referenced in the NSD
+def vnf_ref(vnfd):
+    return {'name': vnfd['name'], 'vendor': vnfd['vendor'], 'version': vnfd['version']}
+
+
+# generate the NSD for a chain of the referenced VNFs (see vnf_ref)
+def generate_nsd(user_inputs, vnf_refs, log):
     log.debug('Generating 5GTANGO NSD')
-    nsd = tango_default_nsd
+    nsd = templates.get('tango_default_nsd.yml')
     nsd['author'] = user_inputs.author
     nsd['vendor'] = user_inputs.vendor
     nsd['name'] = user_inputs.name
@@ -57,7 +65,7 @@ def generate_descriptors(user_inputs, log):
     del nsd['forwarding_graphs'][0]['network_forwarding_paths'][0]['connection_points'][2:4]
 
     # now updated and extend the NSD
-    for i, vnf in enumerate(vnfds):
+    for i, vnf in enumerate(vnf_refs):
         # list of involved VNFs
         # first entry already exists -> adjust, then append new ones
         if i > 0:
@@ -69,7 +77,7 @@ def generate_descriptors(user_inputs, log):
 
         # create corresponding vLinks
         # add vLink to next vnf
-        if i < len(vnfds) - 1:
+        if i < len(vnf_refs) - 1:
             nsd['virtual_links'].append({
                 'id': 'vnf{}-2-vnf{}'.format(i, i+1),
                 'connectivity_type': 'E-Line',
@@ -80,7 +88,7 @@ def generate_descriptors(user_inputs, log):
         # for last vnf in chain, set vLink to output instead
         else:
             nsd['virtual_links'].append({
-                'id': 'vnf{}-2-output'.format(i, i+1),
+                'id': 'vnf{}-2-output'.format(i),
                 'connectivity_type': 'E-Line',
                 'connection_points_reference': [
                     'vnf{}:output'.format(i), 'output'
@@ -94,14 +102,14 @@ def generate_descriptors(user_inputs, log):
             )
 
     # adjust forwarding graph
-    nsd['forwarding_graphs'][0]['number_of_virtual_links'] = len(vnfds) + 1
+    nsd['forwarding_graphs'][0]['number_of_virtual_links'] = len(vnf_refs) + 1
     # append new vLinks (skip mgmt and input-2-vnf0, which are already there)
     for i in range(2, len(nsd['virtual_links'])):
         nsd['forwarding_graphs'][0]['constituent_virtual_links'].append(
             nsd['virtual_links'][i]['id']
         )
     # append new vnfs
-    for i in range(1, len(vnfds)):
+    for i in range(1, len(vnf_refs)):
         nsd['forwarding_graphs'][0]['constituent_vnfs'].append(
             nsd['network_functions'][i]['vnf_id']
         )
@@ -120,7 +128,4 @@ def generate_descriptors(user_inputs, log):
         })
         pos += 1
 
-    # create descriptor dictionary
-    descriptors = {'nsd': nsd, 'vnfds': vnfds}
-    log.info('Generated 5GTANGO descriptors at {}'.format(user_inputs.out_path))
-    return descriptors
+    return nsd
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Default descriptor templates used by the descriptorgen plugins.
+Templates are parsed once per process and handed out as cheap copies.
+"""
+
+import os
+import oyaml as yaml        # ordered yaml to avoid reordering of descriptors
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'default-descriptors')
+
+
+# load and parse a default descriptor once per process
+# the returned template is shared and must not be modified; use get() for a modifiable copy
+@lru_cache(maxsize=None)
+def load(name):
+    with open(os.path.join(TEMPLATE_DIR, name)) as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+
+# return a modifiable copy of the specified default descriptor
+def get(name):
+    return copy(load(name))
+
+
+# structural copy of parsed yaml (dicts, lists and immutable scalars); much faster than copy.deepcopy
+def copy(descriptor):
+    if isinstance(descriptor, dict):
+        if type(descriptor) is dict:
+            return {k: copy(v) for k, v in descriptor.items()}
+        # keep the mapping type, eg, OrderedDict used by oyaml on older Python versions
+        return type(descriptor)((k, copy(v)) for k, v in descriptor.items())
+    if isinstance(descriptor, list):
+        return [copy(v) for v in descriptor]
+    return descriptor
@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+import time
+import bisect
+import threading
+
+
+# request metrics of the REST API (per worker process) for monitoring and capacity planning:
+# request counts per endpoint and status class, latency histograms, and requests in flight
+class RequestMetrics:
+    # upper bounds (seconds) of the latency buckets
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()   # protects the counters
+        self.reset()
+
+    # start over, eg, in a new worker process forked from the process that created the metrics
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.in_flight = 0
+            self._endpoints = {}        # endpoint -> counters
+
+    # seconds since the metrics were (re)started, ie, since the start of the worker process
+    def uptime(self):
+        return time.time() - self.started
+
+    # start measuring a request; returns its start time to be passed to finish
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    # count a finished request of an endpoint (eg, "GET /projects/<uuid>") with its status code
+    def finish(self, endpoint, status_code, start):
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.in_flight -= 1
+            counters = self._endpoints.get(endpoint)
+            if counters is None:
+                counters = {'requests': 0, 'status': {}, 'latency_sum': 0.0,
+                            'latency_counts': [0] * (len(self.buckets) + 1)}
+                self._endpoints[endpoint] = counters
+            status = '{}xx'.format(status_code // 100)
+            counters['requests'] += 1
+            counters['status'][status] = counters['status'].get(status, 0) + 1
+            counters['latency_sum'] += latency
+            counters['latency_counts'][bisect.bisect_left(self.buckets, latency)] += 1
+
+    # consistent copy of all metrics; histograms are cumulative (number of requests with latency <= le)
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, counters in self._endpoints.items():
+                histogram = {}
+                total = 0
+                for le, count in zip(self.buckets + ('+Inf',), counters['latency_counts']):
+                    total += count
+                    histogram[str(le)] = total
+                endpoints[endpoint] = {'requests': counters['requests'], 'status': dict(counters['status']),
+                                       'latency_sum': counters['latency_sum'], 'latency_buckets': histogram}
+            return {'uptime': self.uptime(), 'in_flight': self.in_flight, 'endpoints': endpoints}
+
+    # Prometheus text format (version 0.0.4) of the request metrics and the given additional metrics
+    # metrics: list of (name, type, help, value), eg, ('project_cache_hits_total', 'counter', 'Cache hits', 3)
+    def exposition(self, metrics=(), prefix='tngproject_'):
+        snapshot = self.snapshot()
+        lines = []
+
+        def add(name, type, help, samples):
+            lines.append('# HELP {}{} {}'.format(prefix, name, help))
+            lines.append('# TYPE {}{} {}'.format(prefix, name, type))
+            for suffix, labels, value in samples:
+                lines.append('{}{}{}{} {}'.format(prefix, name, suffix, _labels(labels), _value(value)))
+
+        add('uptime_seconds', 'gauge', 'Seconds since the start of the worker process.',
+            [('', {}, snapshot['uptime'])])
+        add('requests_in_flight', 'gauge', 'Requests currently being processed.',
+            [('', {}, snapshot['in_flight'])])
+        endpoints = sorted(snapshot['endpoints'].items())
+        add('requests_total', 'counter', 'Requests per endpoint and status class.',
+            [('', {'endpoint': endpoint, 'status': status}, count)
+             for endpoint, counters in endpoints for status, count in sorted(counters['status'].items())])
+        samples = []
+        for endpoint, counters in endpoints:
+            for le, count in counters['latency_buckets'].items():
+                samples.append(('_bucket', {'endpoint': endpoint, 'le': le}, count))
+            samples.append(('_sum', {'endpoint': endpoint}, counters['latency_sum']))
+            samples.append(('_count', {'endpoint': endpoint}, counters['requests']))
+        add('request_duration_seconds', 'histogram', 'Request latency per endpoint.', samples)
+        for name, type, help, value in metrics:
+            add(name, type, help, [('', {}, value)])
+        return '\n'.join(lines) + '\n'
+
+
+# {name="value",...} with escaped label values (backslash, quotes, and newlines)
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in labels.items()]
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in escaped) + '}'
+
+
+# sample value; None (eg, an undefined hit rate) as NaN
+def _value(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -33,7 +33,7 @@
 import logging
 import coloredlogs
 import os
-from tngsdk import rest, cli
+from tngsdk import cli
 from tngsdk.project import workspace
 
 log = logging.getLogger(os.path.basename(__file__))
@@ -48,7 +48,9 @@ def main(args=None):
         coloredlogs.install(level='INFO')
 
     # dump Swagger REST API specification
+    # the REST stack (flask, etc.) is only imported when needed to keep the CLI startup fast
     if args.dump_swagger:
+        from tngsdk import rest
         rest.dump_swagger()
         log.info("Dumped Swagger API spec to docs/rest_api.json")
         exit(0)
@@ -57,6 +59,7 @@ def main(args=None):
     if args.service:
         # create the default workspace (required to serve)
         workspace.init_workspace(args)
+        from tngsdk import rest
         rest.serve_forever(args)
     # or use CLI
     else:
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+import os
+import bisect
+import fnmatch
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from tngsdk.project.project import Project, manifest_stamp
+
+log = logging.getLogger(__name__)
+
+
+# bounded LRU cache of loaded projects (eg, for the REST API), keyed by project ID (eg, UUID)
+# cached projects are reused as long as their project.yml wasn't modified by others (see manifest_stamp)
+# access to a project is serialized by a per-project lock, which also coalesces concurrent loads
+# of the same project into one; different projects can be used concurrently
+class ProjectCache:
+    def __init__(self, maxsize=64, loader=Project.load_project):
+        self.maxsize = maxsize
+        self._loader = loader
+        self._projects = OrderedDict()              # key -> project, least recently used first
+        self._locks = weakref.WeakValueDictionary()  # key -> lock; dropped when no request uses the project
+        self._lock = threading.Lock()               # protects the dicts and counters
+        self.hits = 0
+        self.misses = 0
+
+    # lock the specified project and return it (loaded from prj_root unless cached); None if it doesn't exist
+    # the project must only be used (and modified) inside the with block
+    @contextmanager
+    def project(self, key, prj_root):
+        with self._lock:
+            key_lock = self._locks.get(key)
+            if key_lock is None:
+                key_lock = self._locks[key] = threading.RLock()
+        with key_lock:
+            project = self._get(key, prj_root)
+            if project is not None:
+                project.error_msg = None     # only report errors of the current use
+            yield project
+
+    def _get(self, key, prj_root):
+        with self._lock:
+            project = self._projects.get(key)
+        if project is not None and project.manifest_stamp == manifest_stamp(prj_root):
+            with self._lock:
+                self.hits += 1
+                if key in self._projects:
+                    self._projects.move_to_end(key)
+            return project
+
+        log.debug("Project cache miss for {}".format(key))
+        project = self._loader(prj_root)
+        with self._lock:
+            self.misses += 1
+            if project is None:
+                self._projects.pop(key, None)
+                return None
+            self._projects[key] = project
+            self._projects.move_to_end(key)
+            while len(self._projects) > self.maxsize:
+                self._projects.popitem(last=False)
+        return project
+
+    # remove a project from the cache, eg, after deleting it
+    def invalidate(self, key):
+        with self._lock:
+            self._projects.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._projects.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._projects), 'maxsize': self.maxsize,
+                    'hit_rate': self.hits / lookups if lookups else None}
+
+
+# sorted index of the projects (subfolders) in a folder, eg, for listing projects in the REST API
+# the folder is only scanned again if its mtime changed, ie, if projects were created or deleted
+class ProjectIndex:
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self._stamp = None
+        self._names = []
+        self._lock = threading.Lock()
+
+    # sorted list of all project names (do not modify)
+    def names(self):
+        try:
+            stamp = os.stat(self.projects_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            if stamp != self._stamp:
+                log.debug("Scanning projects in {}".format(self.projects_dir))
+                self._names = sorted(e.name for e in os.scandir(self.projects_dir) if e.is_dir())
+                self._stamp = stamp
+            return self._names
+
+    # project names matching the pattern (eg, 'abc*'); returns up to limit names after the name after
+    # (cursor of the previous page) and the cursor for the next page (None if there are no more projects)
+    def list(self, name=None, after=None, limit=None):
+        names = self.names()
+        start = bisect.bisect_right(names, after) if after is not None else 0
+        result = []
+        for i in range(start, len(names)):
+            project_name = names[i]
+            if name is not None and not fnmatch.fnmatchcase(project_name, name):
+                continue
+            if limit is not None and len(result) == limit:
+                return result, result[-1]
+            result.append(project_name)
+        return result, None
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tngsdk.project.project import atomic_write
+
+log = logging.getLogger(__name__)
+
+# jobs are submitted from request threads; forking such a multi-threaded process could deadlock the workers
+# on locks held by other threads (eg, of logging). the fork server forks them from a clean process instead
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class QueueFull(Exception):
+    pass
+
+
+# bounded queue of long-running jobs (eg, packaging), which are executed in a pool of worker processes
+# the status of each job is stored as JSON file in a job folder (eg, inside the project), such that it can be
+# queried from any process (eg, any REST worker) and survives the submitting request
+class JobQueue:
+    def __init__(self, max_workers=2, max_queued=8):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = None           # created on first use (ie, in the process serving requests)
+        self._lock = threading.Lock()
+        self._pending = 0               # queued and running jobs of this process
+
+    # number of queued and running jobs
+    @property
+    def depth(self):
+        return self._pending
+
+    # submit func(*args), which returns a dict with the job result; raises QueueFull if too many jobs are pending
+    # returns the job ID; the job status is saved in job_dir/<job ID>.json (see load_job)
+    def submit(self, job_dir, func, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queued:
+                raise QueueFull("{} jobs pending".format(self._pending))
+            self._pending += 1
+            if self._executor is None:
+                self._executor = _job_pool(self.max_workers)
+
+        job_id = uuid.uuid4().hex
+        status_path = os.path.join(job_dir, job_id + '.json')
+        try:
+            os.makedirs(job_dir, exist_ok=True)
+            save_status(status_path, {'job_id': job_id, 'status': 'queued', 'submitted': time.time()})
+            future = self._executor.submit(_run_job, status_path, func, args)
+        except BaseException:
+            self._job_done(None, status_path)
+            raise
+        future.add_done_callback(lambda f: self._job_done(f, status_path))
+        log.debug("Submitted job {} ({} pending)".format(job_id, self._pending))
+        return job_id
+
+    def _job_done(self, future, status_path):
+        with self._lock:
+            self._pending -= 1
+        # the job itself saves its result; only failures of the pool (eg, a crashed worker) are saved here
+        if future is not None and future.exception() is not None:
+            status = load_status(status_path) or {}
+            status.update({'status': 'failed', 'finished': time.time(), 'error_msg': str(future.exception())})
+            save_status(status_path, status)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# pool of worker processes started with START_METHOD; mp_context requires Python 3.7+, before, jobs run in
+# threads of the submitting process as forking it is not safe
+def _job_pool(max_workers):
+    try:
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(START_METHOD))
+    except TypeError:
+        log.warning("Running jobs in threads instead of processes: requires Python 3.7+")
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def save_status(status_path, status):
+    atomic_write(status_path, json.dumps(status))
+
+
+def load_status(status_path):
+    try:
+        with open(status_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# return the status of the specified job in job_dir or None if it doesn't exist
+def load_job(job_dir, job_id):
+    # job IDs are hex strings; don't allow paths
+    if not job_id.isalnum():
+        return None
+    return load_status(os.path.join(job_dir, job_id + '.json'))
+
+
+# executed in a worker process: run the job and save its status and result
+def _run_job(status_path, func, args):
+    status = load_status(status_path) or {}
+    status.update({'status': 'running', 'started': time.time()})
+    save_status(status_path, status)
+    try:
+        result = func(*args)
+        status.update(result)
+        status['status'] = 'failed' if result.get('error_msg') else 'done'
+    except Exception as ex:
+        log.exception("Job {} failed".format(status_path))
+        status.update({'status': 'failed', 'error_msg': str(ex)})
+    status['finished'] = time.time()
+    save_status(status_path, status)
@@ -36,11 +36,24 @@ import os
 import logging
 import oyaml as yaml        # ordered yaml to avoid reordering of descriptors
 import glob
+import fnmatch
+import json
 import mimetypes
-from collections import defaultdict
-from tabulate import tabulate
+import itertools
+import threading
+import stat
+import tarfile
+import zipfile
+import zlib
+import tempfile
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from tngsdk.project.workspace import Workspace
-from tngsdk.descriptorgen import descriptorgen
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process locking of projects
+    fcntl = None
 
 log = logging.getLogger(__name__)
 
@@ -49,8 +62,15 @@ class Project:
     CONFIG_VERSION = "0.5"
 
     __descriptor_name__ = 'project.yml'
-
-    def __init__(self, workspace, prj_root, config=None):
+    # hidden file next to project.yml caching detected MIME types of descriptors
+    __mime_cache_name__ = '.mime_cache.json'
+    # hidden lock file for coordinating changes of project.yml across processes (see project_lock)
+    __lock_name__ = '.project.lock'
+    # hidden folder with the status of packaging jobs of the REST API
+    __job_dir_name__ = '.package_jobs'
+
+    # jobs: number of parallel workers for detecting MIME types of many files; pool: 'thread' or 'process'
+    def __init__(self, workspace, prj_root, config=None, jobs=1, pool='thread'):
         # be able to hanlde different workspace inputs
         if workspace is None or isinstance(workspace, str):
             # workspace is a string
@@ -59,15 +79,25 @@ class Project:
         self._prj_root = prj_root
         self._workspace = workspace
         self.error_msg = None
+        self.jobs = jobs
+        self.pool = pool
+        # batch mode: nesting depth and whether the manifest has unwritten changes
+        self._batch_depth = 0
+        self._batch_dirty = False
+        # MIME cache: loaded lazily on first use; written together with project.yml
+        self._mime_cache = None
+        self._mime_cache_dirty = False
+        # stat of project.yml when this object last read or wrote it (see manifest_stamp); None if unknown
+        self.manifest_stamp = None
 
         if config:
             self._prj_config = config
         else:
             self.load_default_config()
+        self._build_index()
 
-        # get config from workspace for URL->MIME mapping
-        with open(workspace.config["projects_config"], 'r') as config_file:
-            self.type_mapping = yaml.load(config_file, Loader=yaml.FullLoader)
+        # get config from workspace for URL->MIME mapping (cached by the workspace module)
+        self.type_mapping = workspace.type_mapping
 
     @property
     def project_root(self):
@@ -83,6 +113,7 @@ class Project:
 
     @property
     def project_config(self):
+        self._sync_files()
         return self._prj_config
 
     @property
@@ -124,6 +155,7 @@ class Project:
 
     # generate descriptors using the descriptorgen module and specified args
     def _gen_descriptors(self, args):
+        from tngsdk.descriptorgen import descriptorgen
         args.out_path = self._prj_root
         log.info("Generating descriptors")
         log.debug("Descriptor generation args: {}".format(args))
@@ -133,20 +165,140 @@ class Project:
         log.debug("Adding generated descriptors to project manifest")
         self.add_file(os.path.join(self._prj_root, "*"))
 
+    # (re)builds the in-memory index of manifest entries: by relative path and by MIME type and tag
+    def _build_index(self):
+        self._file_index = OrderedDict()
+        self._type_index = defaultdict(OrderedDict)
+        self._tag_index = defaultdict(OrderedDict)
+        self._positions = {}    # cached paths and positions of the files of an index (see _paging_positions)
+        self._files_stale = False
+        for f in self._prj_config.get('files') or []:
+            # drop duplicate paths from old manifests; keep the last entry
+            if f['path'] in self._file_index:
+                self._unindex_file(self._file_index[f['path']])
+                self._files_stale = True
+            self._index_file(f)
+
+    def _index_file(self, file):
+        self._positions.clear()
+        self._file_index[file['path']] = file
+        self._type_index[file['type']][file['path']] = file
+        for tag in file.get('tags') or []:
+            self._tag_index[tag][file['path']] = file
+
+    def _unindex_file(self, file):
+        self._positions.clear()
+        del self._file_index[file['path']]
+        del self._type_index[file['type']][file['path']]
+        for tag in file.get('tags') or []:
+            self._tag_index[tag].pop(file['path'], None)
+
+    # rebuilds the manifest's file list from the index after removals (keeps order)
+    def _sync_files(self):
+        if self._files_stale:
+            self._prj_config['files'] = list(self._file_index.values())
+            self._files_stale = False
+
     # writes project descriptor to file (project.yml)
     def _write_prj_yml(self):
+        self._sync_files()
         prj_path = os.path.join(self._prj_root, Project.__descriptor_name__)
-        with open(prj_path, 'w') as prj_file:
-            prj_file.write(yaml.dump(self._prj_config,
-                                     default_flow_style=False))
+        atomic_write(prj_path, yaml.dump(self._prj_config, default_flow_style=False))
+        self.manifest_stamp = manifest_stamp(self._prj_root)
+        self._write_mime_cache()
+
+    # loads the MIME cache {rel. path: [size, mtime, inode, type]} or starts with an empty cache
+    def _load_mime_cache(self):
+        self._mime_cache = {}
+        cache_path = os.path.join(self._prj_root, Project.__mime_cache_name__)
+        if os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'r') as cache_file:
+                    self._mime_cache = json.load(cache_file)
+            except (OSError, ValueError) as exc:
+                log.debug('Ignoring invalid MIME cache {}: {}'.format(cache_path, exc))
+
+    # writes the MIME cache next to project.yml if it changed
+    def _write_mime_cache(self):
+        if not self._mime_cache_dirty:
+            return
+        cache_path = os.path.join(self._prj_root, Project.__mime_cache_name__)
+        try:
+            atomic_write(cache_path, json.dumps(self._mime_cache))
+            self._mime_cache_dirty = False
+        except OSError as exc:
+            log.debug('Could not write MIME cache {}: {}'.format(cache_path, exc))
+
+    # returns the cached MIME type of the file if size, mtime and inode are unchanged (else None)
+    def _cached_mime_type(self, file, stat):
+        if self._mime_cache is None:
+            self._load_mime_cache()
+        entry = self._mime_cache.get(self._rel_path(file))
+        if entry and entry[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+            return entry[3]
+        return None
+
+    def _cache_mime_type(self, file, stat, type):
+        self._mime_cache[self._rel_path(file)] = [stat.st_size, stat.st_mtime_ns, stat.st_ino, type]
+        self._mime_cache_dirty = True
+
+    # batch mode: collect all manifest changes and write project.yml only once at the end
+    # usage: with project.batch(): project.add_file(...); ...
+    # the outermost batch holds the exclusive project lock (load-modify-write): it first reloads project.yml
+    # if another process changed it since it was read, such that concurrent changes are not lost
+    @contextmanager
+    def batch(self):
+        if self._batch_depth > 0:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+
+        with project_lock(self._prj_root):
+            self._refresh()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                self.commit()
+
+    # reload project.yml if it was changed by someone else since this object read or wrote it
+    def _refresh(self):
+        stamp = manifest_stamp(self._prj_root)
+        if self.manifest_stamp is None or stamp is None or stamp == self.manifest_stamp:
+            return
+        log.debug('Reloading {}, which was modified by another process'.format(Project.__descriptor_name__))
+        with open(os.path.join(self._prj_root, Project.__descriptor_name__), 'r') as prj_file:
+            prj_config = yaml.load(prj_file, Loader=yaml.FullLoader)
+        if prj_config:
+            self._prj_config = prj_config
+            self._build_index()
+        self.manifest_stamp = stamp
+
+    # writes pending manifest changes to project.yml (no-op if nothing changed)
+    def commit(self):
+        if self._batch_dirty:
+            self._batch_dirty = False
+            self._write_prj_yml()
+
+    # persist manifest changes immediately or, in batch mode, on commit
+    def _save_prj_yml(self):
+        if self._batch_depth > 0:
+            self._batch_dirty = True
+        else:
+            self._write_prj_yml()
 
     # resolves wildcards by calling add/remove_file for each file
     def resolve_wildcards(self, path, add=False, remove=False):
-        for f in glob.glob(path):
-            if add:
-                self.add_file(f)
-            if remove:
-                self.remove_file(f)
+        if add:
+            self.add_files([path])
+        if remove:
+            with self.batch():
+                for f in glob.glob(path):
+                    self.remove_file(f)
 
     # detects and returns MIME type of specified file
     def mime_type(self, file):
@@ -158,20 +310,13 @@ class Project:
             name, extension = os.path.splitext(file)
 
             # check yml files to detect and classify 5GTANGO descriptors
+            # skip parsing unchanged descriptors that are already in the MIME cache
             if extension == ".yml" or extension == ".yaml":
-                with open(file, 'r') as yml_file:
-                    yml_file = yaml.load(yml_file, Loader=yaml.FullLoader)
-                    if 'descriptor_schema' in yml_file:
-                        type = self.type_mapping[yml_file['descriptor_schema']]
-                    # try to detect OSM descriptors based on field names
-                    elif 'constituent-vnfd' in yml_file and 'vld' in yml_file:
-                        type = 'application/vnd.etsi.osm.nsd'
-                    elif 'vnfd-catalog' in yml_file:
-                        type = 'application/vnd.etsi.osm.vnfd'
-                    else:
-                        log.warning('Could not detect MIME type of {}. '
-                                    'Using text/yaml'.format(file))
-                        type = 'text/yaml'
+                stat = os.stat(file)
+                type = self._cached_mime_type(file, stat)
+                if type is None:
+                    type = self._yaml_mime_type(file)
+                    self._cache_mime_type(file, stat, type)
 
             # for non-yml files determine the type using mimetypes
             else:
@@ -185,12 +330,95 @@ class Project:
         log.debug('Detected MIME type: {}'.format(type))
         return type
 
+    # detects and returns the MIME types of the specified files (in the same order)
+    # if jobs > 1, yml files that are not in the MIME cache are classified in a thread or process pool
+    def mime_types(self, files):
+        if self.jobs <= 1 or len(files) <= 1:
+            return [self.mime_type(f) for f in files]
+
+        types = [None] * len(files)
+        pending = []        # (index, stat) of yml files that need to be classified
+        for i, f in enumerate(files):
+            if os.path.isfile(f) and os.path.splitext(f)[1] in ('.yml', '.yaml'):
+                stat = os.stat(f)
+                types[i] = self._cached_mime_type(f, stat)
+                if types[i] is None:
+                    pending.append((i, stat))
+            else:
+                types[i] = self.mime_type(f)
+        if not pending:
+            return types
+
+        executor_cls = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+        log.debug('Detecting MIME types of {} files with {} {} workers'.format(len(pending), self.jobs, self.pool))
+        with executor_cls(max_workers=self.jobs) as executor:
+            pending_files = [files[i] for i, _ in pending]
+            chunksize = max(1, len(pending) // (self.jobs * 4))
+            results = executor.map(_detect_yaml_mime_type, pending_files, itertools.repeat(self.type_mapping),
+                                   chunksize=chunksize)
+            for (i, stat), type in zip(pending, results):
+                self._cache_mime_type(files[i], stat, type)
+                types[i] = type
+        return types
+
+    # classifies a yml file as 5GTANGO or OSM descriptor (or plain yaml)
+    def _yaml_mime_type(self, file):
+        return _detect_yaml_mime_type(file, self.type_mapping)
+
+    # streams the parser events of a yml file without constructing the descriptor
+    # returns a dict of the top-level keys (values are None, except for descriptor_schema)
+    # stops as soon as descriptor_schema is found; returns None if the keys cannot be determined reliably
+    @staticmethod
+    def _sniff_yaml_keys(file):
+        keys = {}
+        depth = 0
+        expect_key = False
+        key = None
+        try:
+            with open(file, 'r') as yml_file:
+                for event in yaml.parse(yml_file, Loader=yaml.SafeLoader):
+                    if isinstance(event, (yaml.StreamStartEvent, yaml.DocumentStartEvent)):
+                        continue
+                    # top-level node has to be a mapping
+                    if depth == 0:
+                        if not isinstance(event, yaml.MappingStartEvent):
+                            return None
+                        depth, expect_key = 1, True
+                    # top-level keys and values
+                    elif depth == 1:
+                        if isinstance(event, yaml.MappingEndEvent):
+                            return keys
+                        if expect_key:
+                            # complex or merge keys could hide other keys
+                            if not isinstance(event, yaml.ScalarEvent) or event.value == '<<':
+                                return None
+                            key, expect_key = event.value, False
+                            keys[key] = None
+                        elif key == 'descriptor_schema':
+                            if not isinstance(event, yaml.ScalarEvent):
+                                return None
+                            keys[key] = event.value
+                            return keys
+                        elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                            depth += 1
+                        else:
+                            expect_key = True
+                    # skip nested values
+                    elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                        depth += 1
+                    elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                        depth -= 1
+                        if depth == 1:
+                            expect_key = True
+        except yaml.YAMLError as exc:
+            log.debug('Could not sniff keys of {}: {}'.format(file, exc))
+        return None
+
     # adds a file to the project: detects type and adds to project.yml
     def add_file(self, file_path, type=None):
         # resolve wildcards
         if '*' in file_path:
-            log.debug('Attempting to resolve wildcard in {}'.format(file_path))
-            self.resolve_wildcards(file_path, add=True)
+            self.add_files([file_path], type=type)
             return
 
         # try to detect the MIME type if none is given
@@ -199,6 +427,35 @@ class Project:
             # path is not a file or directory -> ignore and don't add
             if type == -1:
                 return
+        with self.batch():
+            self._add_file(file_path, type)
+
+    # adds multiple files (wildcards allowed) to the project and writes project.yml once
+    # MIME types are detected in parallel if the project has jobs > 1
+    # returns the list of (path, type) of the added files
+    def add_files(self, file_paths, type=None):
+        files = []
+        for path in file_paths:
+            if '*' in path:
+                log.debug('Attempting to resolve wildcard in {}'.format(path))
+                files.extend(glob.glob(path))
+            else:
+                files.append(path)
+
+        if type is None:
+            types = self.mime_types(files)
+        else:
+            types = [type] * len(files)
+        added = []
+        with self.batch():
+            for f, t in zip(files, types):
+                # path is not a file or directory -> ignore and don't add
+                if t != -1:
+                    added.append((f, self._add_file(f, t)))
+        return added
+
+    # adds a file with known (or undetectable = None) MIME type to project.yml and returns the used type
+    def _add_file(self, file_path, type):
         if type is None:
             log.warning('Could not detect MIME type of {}. Using "application/octet-stream".'.format(file_path))
             self.error_msg = 'Could not detect MIME type of {}. Using "application/octet-stream".'.format(file_path)
@@ -211,23 +468,26 @@ class Project:
         elif 'osm' in type:
             tags = ['etsi.osm']
 
-        # calculate relative file path to project root
-        abs_file_path = os.path.abspath(file_path)
-        abs_prj_root = os.path.abspath(self._prj_root)
-        rel_file_path = os.path.relpath(abs_file_path, abs_prj_root)
-        # fix windows paths by replacing \ with /
-        if os.name == 'nt':
-            rel_file_path = rel_file_path.replace('\\', '/')
-            log.debug('Adjusted Windows path in project.yml: {}'.format(rel_file_path))
-
-        # add to project.yml
+        # add to project.yml; update type and tags if the path is already listed with a different type
+        rel_file_path = self._rel_path(file_path)
         file = {'path': rel_file_path, 'type': type, 'tags': tags}
-        if file in self._prj_config['files']:
+        existing = self._file_index.get(rel_file_path)
+        if existing == file:
             log.warning('{} is already in project.yml.'.format(file_path))
+        elif existing is not None:
+            self._unindex_file(existing)
+            existing['type'] = type
+            existing['tags'] = tags
+            self._index_file(existing)
+            self._save_prj_yml()
+            log.info('Updated type of {} in project.yml to {}'.format(file_path, type))
         else:
-            self._prj_config['files'].append(file)
-            self._write_prj_yml()
+            self._index_file(file)
+            if not self._files_stale:
+                self._prj_config['files'].append(file)
+            self._save_prj_yml()
             log.info('Added {} to project.yml'.format(file_path))
+        return type
 
     # removes a file from the project
     def remove_file(self, file_path):
@@ -237,25 +497,39 @@ class Project:
             self.resolve_wildcards(file_path, remove=True)
             return
 
-        # calculate relative file path to project root (similar to add_file)
+        # look up the file by its relative path; the file list is rebuilt lazily before writing
+        with self.batch():
+            file = self._file_index.get(self._rel_path(file_path))
+            if file is None:
+                log.warning('{} is not in project.yml'.format(file_path))
+                return
+            self._unindex_file(file)
+            self._files_stale = True
+            self._save_prj_yml()
+        log.info('Removed {} from project.yml'.format(file_path))
+
+    # calculates the file path relative to the project root as used in project.yml
+    def _rel_path(self, file_path):
         abs_file_path = os.path.abspath(file_path)
         abs_prj_root = os.path.abspath(self._prj_root)
         rel_file_path = os.path.relpath(abs_file_path, abs_prj_root)
-        # adjust to windows paths by replacing \ with /
+        # fix windows paths by replacing \ with /
         if os.name == 'nt':
             rel_file_path = rel_file_path.replace('\\', '/')
-            log.debug('Adjusted relative Windows path to match project.yml: {}'.format(rel_file_path))
+            log.debug('Adjusted Windows path in project.yml: {}'.format(rel_file_path))
+        return rel_file_path
 
-        for f in self._prj_config['files']:
-            if f['path'] == rel_file_path:
-                self._prj_config['files'].remove(f)
-                self._write_prj_yml()
-                log.info('Removed {} from project.yml'.format(file_path))
-                return
-        log.warning('{} is not in project.yml'.format(file_path))
+    # zip archive of project.yml and all files in the manifest, generated in chunks while reading the files
+    # (constant memory, no temporary file); paths in the archive are prefixed with prefix (eg, 'project/')
+    # compresslevel: 0 (no compression, fastest) to 9; already compressed files are always stored uncompressed
+    def zip_stream(self, prefix='', compresslevel=6):
+        # take the file list now, such that the project may be changed while the archive is generated
+        paths = [Project.__descriptor_name__] + [f['path'] for f in self.project_config['files']]
+        return _zip_stream(self._prj_root, paths, prefix, compresslevel)
 
     # prints project info/status
     def status(self):
+        self._sync_files()
         # print general info
         print('Project: {}'.format(self._prj_config['package']['name']))
         print('Vendor: {}'.format(self._prj_config['package']['vendor']))
@@ -268,6 +542,7 @@ class Project:
             return
 
         # collect and print info about involved MIME types (type + quanity)
+        from tabulate import tabulate
         types = defaultdict(int)
         for f in self._prj_config['files']:
             types[f['type']] += 1
@@ -309,14 +584,14 @@ class Project:
             if os.path.isfile(nsd):
                 self.translate_descriptor(nsd, vnfd=False)
 
-        # create files section and add files
+        # create files section and add files (written to project.yml once at the end)
         log.debug('Creating "files" section and adding all files in {}'.format(self._prj_root))
-        self._prj_config['files'] = []
-        for f in glob.glob(os.path.join(self._prj_root, 'sources', '**'), recursive=True):
-            if os.path.isfile(f):
-                self.add_file(f)
-
-        self._write_prj_yml()
+        with self.batch():
+            self._prj_config['files'] = []
+            self._build_index()
+            files = glob.glob(os.path.join(self._prj_root, 'sources', '**'), recursive=True)
+            self.add_files([f for f in files if os.path.isfile(f)])
+            self._save_prj_yml()
         log.info('Successfully translated {} to 5GTANGO project.'.format(self._prj_root))
 
     # return a list of relative file paths to all NSDs (default: Tango NSDs)
@@ -342,7 +617,55 @@ class Project:
 
     # return a list of relative (to proj root) file paths to files of the specified type
     def get_file_paths(self, type):
-        return [f['path'] for f in self._prj_config['files'] if f['type'] == type]
+        return list(self._type_index.get(type, ()))
+
+    # return a list of relative (to proj root) file paths to files with the specified tag
+    def get_file_paths_by_tag(self, tag):
+        return list(self._tag_index.get(tag, ()))
+
+    # files in the manifest filtered by MIME type, tag, and path pattern (eg, 'sources/*.yml'), using the type and tag
+    # index; returns up to limit files after the file with path after (cursor of the previous page) and the
+    # cursor for the next page (None if there are no more files); raises ValueError if after is not listed
+    def list_files(self, type=None, tag=None, name=None, after=None, limit=None):
+        if type is not None:
+            key = ('type', type)
+            candidates = self._type_index.get(type, {})
+        elif tag is not None:
+            key = ('tag', tag)
+            candidates = self._tag_index.get(tag, {})
+        else:
+            key = ('path', None)
+            candidates = self._file_index
+        paths = iter(candidates)
+        if after is not None:
+            if after not in candidates:
+                raise ValueError('Invalid cursor: {} is not in the selected files'.format(after))
+            # continue right after the cursor instead of scanning all files before it
+            all_paths, positions = self._paging_positions(key, candidates)
+            paths = (all_paths[i] for i in range(positions[after] + 1, len(all_paths)))
+
+        result = []
+        for path in paths:
+            file = candidates[path]
+            if tag is not None and tag not in (file.get('tags') or []):
+                continue
+            if name is not None and not fnmatch.fnmatchcase(file['path'], name):
+                continue
+            # there are more files: return the page and the cursor of the next one
+            if limit is not None and len(result) == limit:
+                return result, result[-1]['path']
+            result.append(file)
+        return result, None
+
+    # list of paths and {path: position} of the files of an index (in manifest order) for paging with a cursor
+    # cached until the index changes
+    def _paging_positions(self, key, candidates):
+        positions = self._positions.get(key)
+        if positions is None:
+            paths = list(candidates)
+            positions = paths, {path: i for i, path in enumerate(paths)}
+            self._positions[key] = positions
+        return positions
 
     @staticmethod
     def __is_valid__(project):
@@ -359,7 +682,7 @@ class Project:
 
     # loads a project using its project manifest (project.yml)
     @staticmethod
-    def load_project(prj_root, workspace=None, translate=False):
+    def load_project(prj_root, workspace=None, translate=False, jobs=1, pool='thread'):
         # load default workspace if none specified
         if workspace is None:
             workspace = Workspace.load_workspace(Workspace.DEFAULT_WORKSPACE_DIR)
@@ -370,9 +693,10 @@ class Project:
             log.error("Unable to load project manifest '{}'".format(prj_filename))
             return None
 
-        # load project manifest
+        # load project manifest; stat before reading such that later changes are detected (see manifest_stamp)
         log.info("Loading project '{}'".format(prj_filename))
-        with open(prj_filename, 'r') as prj_file:
+        with project_lock(prj_root, shared=True), open(prj_filename, 'r') as prj_file:
+            stamp = manifest_stamp(prj_root)
             try:
                 prj_config = yaml.load(prj_file, Loader=yaml.FullLoader)
             except yaml.YAMLError as exc:
@@ -383,8 +707,10 @@ class Project:
                 return
 
         # create a new project object with the same manifest
+        project = Project(workspace, prj_root, config=prj_config, jobs=jobs, pool=pool)
+        project.manifest_stamp = stamp
         if prj_config['version'] == Project.CONFIG_VERSION:
-            return Project(workspace, prj_root, config=prj_config)
+            return project
 
         # deal with different versions
         if prj_config['version'] < Project.CONFIG_VERSION and not translate:
@@ -394,4 +720,238 @@ class Project:
             log.warning("Project version {} is ahead of the current version {}."
                         .format(prj_config['version'], Project.CONFIG_VERSION))
 
-        return Project(workspace, prj_root, config=prj_config)
+        return project
+
+
+# advisory lock of a project across processes: shared for reading and exclusive for changing project.yml
+# no-op if the project directory doesn't exist (yet) or on platforms without fcntl (Windows)
+# only exclusive locks create the lock file; reading a project without lock file (eg, a read-only checkout) is
+# not locked, which is safe as project.yml is always replaced atomically
+@contextmanager
+def project_lock(prj_root, shared=False):
+    if fcntl is None or not os.path.isdir(prj_root):
+        yield
+        return
+    lock_path = os.path.join(prj_root, Project.__lock_name__)
+    lock_file = None
+    if not shared:
+        lock_file = open(lock_path, 'a')
+    elif os.path.isfile(lock_path):
+        try:
+            lock_file = open(lock_path, 'r')
+        except OSError:
+            log.debug('Reading {} without lock: cannot open {}'.format(prj_root, lock_path))
+    if lock_file is None:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# write a file atomically: readers see either the old or the new content, never a partially written file
+def atomic_write(path, content):
+    # hidden temp file in the same directory (rename is only atomic within a file system)
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, '.{}.{}.{}.tmp'.format(name, os.getpid(), threading.get_ident()))
+    try:
+        with open(tmp_path, 'w') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# files and folders of a project that cannot be overwritten by uploads
+UPLOAD_RESERVED_NAMES = {Project.__descriptor_name__, Project.__mime_cache_name__, Project.__lock_name__,
+                         Project.__job_dir_name__}
+# prefix of the temp files of uploads that are still being received (see rest.UploadFile)
+UPLOAD_TMP_PREFIX = '.upload.'
+# default limits of the extracted files of an archive (eg, against zip bombs)
+ARCHIVE_MAX_SIZE = 1 << 32
+ARCHIVE_MAX_FILES = 10000
+
+
+# path of an uploaded file inside the project (prj_root/rel_path) or None if the path is invalid
+# rejects absolute paths, paths leaving the project (eg, ../x or via symlinks), the project's own metadata files,
+# and existing directories (which cannot be replaced by a file)
+# the returned path is below prj_root (not resolved) such that it is added to project.yml relative to prj_root
+# even if prj_root itself is (inside) a symlink, eg, to a Docker volume
+def upload_path(prj_root, rel_path):
+    rel_path = rel_path.replace('\\', '/').strip()
+    if not rel_path or rel_path.startswith('/') or os.path.isabs(rel_path):
+        return None
+    parts = [p for p in rel_path.split('/') if p not in ('', '.')]
+    if not parts or '..' in parts or parts[0] in UPLOAD_RESERVED_NAMES or parts[-1].startswith(UPLOAD_TMP_PREFIX):
+        return None
+    path = os.path.join(prj_root, *parts)
+    real_root = os.path.realpath(prj_root)
+    if not os.path.realpath(path).startswith(real_root + os.sep) or os.path.isdir(path):
+        return None
+    return path
+
+
+# extract a zip or tar(.gz/.bz2/.xz) archive from a (seekable) file object into the project
+# only regular files are extracted, links and paths outside the project are rejected
+# raises ValueError for invalid archives and archives with more than max_files files or max_size bytes in total
+# (checked before extracting anything and again while extracting)
+# returns the list of (name, path, error) of all archive members; path is None for rejected ones
+def extract_archive(fileobj, prj_root, max_size=ARCHIVE_MAX_SIZE, max_files=ARCHIVE_MAX_FILES):
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            members = [(info.filename, info, info.file_size, stat.S_ISLNK(info.external_attr >> 16))
+                       for info in archive.infolist() if not info.is_dir()]
+            return _extract_members(prj_root, archive.open, members, max_size, max_files)
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r:*')
+    except tarfile.TarError:
+        raise ValueError('Not a zip or tar archive')
+    with archive:
+        members = [(info.name, info, info.size if info.isfile() else 0, not info.isfile())
+                   for info in archive.getmembers() if not info.isdir()]
+        return _extract_members(prj_root, archive.extractfile, members, max_size, max_files)
+
+
+# extract the (name, info, size, rejected) members with the open function of the archive
+# members are extracted to temp files first, which replace the project's files only once all are extracted;
+# if the archive turns out to exceed max_size, the temp files are removed and the project is unchanged
+def _extract_members(prj_root, open_member, members, max_size, max_files):
+    if max_files is not None and len(members) > max_files:
+        raise ValueError('Archive contains more than {} files'.format(max_files))
+    if max_size is not None and sum(size for _, _, size, _ in members) > max_size:
+        raise ValueError('Extracted archive exceeds the max. size of {} bytes'.format(max_size))
+    # remaining bytes; the sizes in the archive's headers are not trusted while extracting
+    budget = [max_size]
+    extracted = []
+    try:
+        for name, info, _, rejected in members:
+            extracted.append(_extract_member(prj_root, name, open_member, info, rejected, budget))
+    except BaseException:
+        for _, _, tmp_path, _ in extracted:
+            if tmp_path is not None:
+                os.remove(tmp_path)
+        raise
+    for _, path, tmp_path, _ in extracted:
+        if tmp_path is not None:
+            os.replace(tmp_path, path)
+    return [(name, path, error) for name, path, _, error in extracted]
+
+
+# extract a single archive member to a temp file next to its path; returns (name, path, temp path, error)
+def _extract_member(prj_root, name, open_member, info, rejected, budget):
+    if rejected:
+        log.warning('Skipping {} in archive: not a regular file'.format(name))
+        return name, None, None, 'Not a regular file'
+    path = upload_path(prj_root, name)
+    if path is None:
+        log.warning('Skipping {} in archive: invalid path'.format(name))
+        return name, None, None, 'Invalid path'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=UPLOAD_TMP_PREFIX, suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as dest, open_member(info) as src:
+            for data in iter(lambda: src.read(ZIP_CHUNK_SIZE), b''):
+                if budget[0] is not None:
+                    budget[0] -= len(data)
+                    if budget[0] < 0:
+                        raise ValueError('Extracted archive exceeds the max. size')
+                dest.write(data)
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as ex:
+        log.warning('Could not extract {} from archive: {}'.format(name, ex))
+        os.remove(tmp_path)
+        return name, None, None, 'Could not extract: {}'.format(ex)
+    except ValueError:
+        os.remove(tmp_path)
+        raise
+    return name, path, tmp_path, None
+
+
+# file extensions of compressed files, which are stored in zip archives without compressing them again
+COMPRESSED_EXTENSIONS = {'.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.tng', '.jpg', '.jpeg', '.png', '.gif',
+                         '.mp4', '.qcow2', '.vmdk', '.iso'}
+ZIP_CHUNK_SIZE = 1 << 16
+
+
+# write-only file object collecting the output of a ZipFile until it is sent (see _zip_stream)
+class _ZipBuffer:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# generate a zip archive of the files (relative to root) in chunks
+def _zip_stream(root, paths, prefix, compresslevel):
+    buffer = _ZipBuffer()
+    compression = zipfile.ZIP_DEFLATED if compresslevel > 0 else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        real_root = os.path.realpath(root)
+        for path in paths:
+            file_path = os.path.realpath(os.path.join(root, path))
+            if not file_path.startswith(real_root + os.sep) or not os.path.isfile(file_path):
+                log.warning('Skipping {} in zip archive: not a file in project {}'.format(path, root))
+                continue
+            info = zipfile.ZipInfo.from_file(file_path, prefix + path)
+            if os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = compression
+                # per-file level (Python 3.7+); before, the default level is used
+                info._compresslevel = compresslevel
+            # zip64 as the size is unknown to the unseekable stream when the header is written
+            with open(file_path, 'rb') as src, archive.open(info, 'w', force_zip64=True) as dest:
+                for data in iter(lambda: src.read(ZIP_CHUNK_SIZE), b''):
+                    dest.write(data)
+                    chunk = buffer.pop()
+                    if chunk:
+                        yield chunk
+            yield buffer.pop()
+    # central directory
+    yield buffer.pop()
+
+
+# (mtime, size, inode) of the project.yml in prj_root or None if it doesn't exist
+# a loaded project is up to date as long as the stamp is unchanged (eg, for caching projects)
+def manifest_stamp(prj_root):
+    try:
+        stat = os.stat(os.path.join(prj_root, Project.__descriptor_name__))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+# classifies a yml file as 5GTANGO or OSM descriptor (or plain yaml) based on its top-level keys
+# module-level function such that it can be used in a process pool
+def _detect_yaml_mime_type(file, type_mapping):
+    # only look at the top-level keys; parse the full file if that is not sufficient
+    yml_file = Project._sniff_yaml_keys(file)
+    if yml_file is None:
+        log.debug('Parsing full file {} to detect MIME type'.format(file))
+        with open(file, 'r') as f:
+            yml_file = yaml.load(f, Loader=yaml.FullLoader)
+    if 'descriptor_schema' in yml_file:
+        return type_mapping[yml_file['descriptor_schema']]
+    # try to detect OSM descriptors based on field names
+    elif 'constituent-vnfd' in yml_file and 'vld' in yml_file:
+        return 'application/vnd.etsi.osm.nsd'
+    elif 'vnfd-catalog' in yml_file:
+        return 'application/vnd.etsi.osm.vnfd'
+    log.warning('Could not detect MIME type of {}. Using text/yaml'.format(file))
+    return 'text/yaml'
@@ -42,6 +42,11 @@ import argparse
 
 log = logging.getLogger(__name__)
 
+# process-wide caches of loaded workspaces and project configs (type mappings)
+# {absolute file path: ((mtime, size), loaded object)}; entries are replaced when the file changes
+_workspace_cache = dict()
+_projects_config_cache = dict()
+
 
 class Workspace:
     BACK_CONFIG_VERSION = "0.03"
@@ -104,6 +109,11 @@ class Workspace:
     def config(self):
         return self._ws_config
 
+    @property
+    def type_mapping(self):
+        """Schema URL <-> MIME type mapping from the projects config (cached per process)"""
+        return load_projects_config(self.config['projects_config'])
+
     @property
     def catalogues_dir(self):
         return self.config['catalogues']
@@ -193,12 +203,7 @@ class Workspace:
         This is triggered by workspace creation and configuration changes.
         :return:
         """
-        cfg_d = self.config.copy()
-        ws_file_path = os.path.join(self.workspace_root,
-                                    Workspace.__descriptor_name__)
-
-        ws_file = open(ws_file_path, 'w')
-        yaml.dump(cfg_d, ws_file, default_flow_style=False)
+        cfg_d = self.write_config()
 
         # write project config (schema-MIME mapping)
         mapping = {
@@ -222,11 +227,23 @@ class Workspace:
         mapping.update(reverse_mapping)
 
         conf_path = os.path.join(self.workspace_root, 'projects', 'config.yml')
-        conf_file = open(conf_path, 'w')
-        yaml.dump(mapping, conf_file, default_flow_style=False)
+        with open(conf_path, 'w') as conf_file:
+            yaml.dump(mapping, conf_file, default_flow_style=False)
 
         return cfg_d
 
+    def write_config(self):
+        """
+        Writes the workspace configuration descriptor (workspace.yml).
+        :return: dumped configuration
+        """
+        cfg_d = self.config.copy()
+        ws_file_path = os.path.join(self.workspace_root,
+                                    Workspace.__descriptor_name__)
+        with open(ws_file_path, 'w') as ws_file:
+            yaml.dump(cfg_d, ws_file, default_flow_style=False)
+        return cfg_d
+
     def check_ws_exists(self):
         ws_file = os.path.join(self.workspace_root,
                                Workspace.__descriptor_name__)
@@ -236,7 +253,9 @@ class Workspace:
     @staticmethod
     def load_workspace(ws_root):
         """
-        Creates a Workspace object based on a configuration descriptor
+        Creates a Workspace object based on a configuration descriptor.
+        Loaded workspaces are cached per process and shared until
+        the configuration descriptor changes.
         :param ws_root: base path of the workspace
         :return: Workspace object
         """
@@ -255,14 +274,22 @@ class Workspace:
                           + "location with -w".format(ws_filename))
                 return None
 
-        ws_file = open(ws_filename, 'r')
-        try:
-            ws_config = yaml.load(ws_file, Loader=yaml.FullLoader)
-
-        except yaml.YAMLError as exc:
-            log.error("Error parsing descriptor file '{0}': {1}"
-                      .format(ws_filename, exc))
-            return
+        # reuse the cached workspace if workspace.yml did not change
+        cache_key = os.path.abspath(ws_filename)
+        file_stamp = (os.path.getmtime(ws_filename),
+                      os.path.getsize(ws_filename))
+        cached = _workspace_cache.get(cache_key)
+        if cached and cached[0] == file_stamp:
+            return cached[1]
+
+        with open(ws_filename, 'r') as ws_file:
+            try:
+                ws_config = yaml.load(ws_file, Loader=yaml.FullLoader)
+
+            except yaml.YAMLError as exc:
+                log.error("Error parsing descriptor file '{0}': {1}"
+                          .format(ws_filename, exc))
+                return
         if not ws_config:
             log.error("Couldn't read descriptor file: '{0}'"
                       .format(ws_filename))
@@ -306,12 +333,29 @@ class Workspace:
                 sp['credentials']['signature']['prv_key'] = ''
                 sp['credentials']['signature']['cert'] = ''
 
+        # persist the updated configuration once instead of updating it on every load
         if ws_config['version'] < Workspace.CONFIG_VERSION:
             log.warning("Loading workspace with an old configuration "
                         "version ({0}). Updated configuration: {1}"
                         .format(ws_config['version'], ws.config))
+            ws.config['version'] = Workspace.CONFIG_VERSION
+            try:
+                ws.write_config()
+                file_stamp = (os.path.getmtime(ws_filename),
+                              os.path.getsize(ws_filename))
+            except OSError as exc:
+                log.warning("Could not save updated workspace configuration "
+                            "'{0}': {1}".format(ws_filename, exc))
+
+        _workspace_cache[cache_key] = (file_stamp, ws)
         return ws
 
+    @staticmethod
+    def clear_cache():
+        """Clears the process-wide cache of loaded workspaces and project configs"""
+        _workspace_cache.clear()
+        _projects_config_cache.clear()
+
     @property
     def default_service_platform(self):
         return self.config['default_service_platform']
@@ -395,6 +439,25 @@ class Workspace:
             and self.config == other.config
 
 
+def load_projects_config(config_path):
+    """
+    Loads the projects config (schema URL <-> MIME type mapping).
+    The parsed config is cached per process until the file changes.
+    :param config_path: path of the projects config (projects/config.yml)
+    :return: dict with the type mapping
+    """
+    cache_key = os.path.abspath(config_path)
+    file_stamp = (os.path.getmtime(config_path), os.path.getsize(config_path))
+    cached = _projects_config_cache.get(cache_key)
+    if cached and cached[0] == file_stamp:
+        return cached[1]
+
+    with open(config_path, 'r') as config_file:
+        mapping = yaml.load(config_file, Loader=yaml.FullLoader)
+    _projects_config_cache[cache_key] = (file_stamp, mapping)
+    return mapping
+
+
 def parse_args_workspace(input_args=None):
     parser = argparse.ArgumentParser(description="Create a new workspace")
 
@@ -31,27 +31,42 @@
 # partner consortium (www.5gtango.eu).
 
 import logging
-import subprocess
 import json
+import time
 import os
+import copy
 import uuid
+import base64
+import hashlib
+import binascii
+import errno
 import shutil
-import zipfile
-from flask import Flask, Blueprint, send_from_directory
-from flask_restplus import Resource, Api, Namespace, fields, inputs
+import tempfile
+import importlib.util
+from werkzeug.http import http_date
+from flask import Flask, Blueprint, Request, Response, g, request, send_from_directory, send_file
+from flask_restplus import Resource, Api, Namespace, fields, inputs, marshal
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.datastructures import FileStorage
 from tngsdk import cli
+from tngsdk.descriptorgen import descriptorgen
+from tngsdk.metrics import RequestMetrics
+from tngsdk.project.cache import ProjectCache, ProjectIndex
 # important: import as cli_project; else would collide with Project class here
 from tngsdk.project.project import Project as cli_project
+from tngsdk.project.project import manifest_stamp, upload_path, extract_archive
+from tngsdk.project.project import UPLOAD_RESERVED_NAMES, UPLOAD_TMP_PREFIX, ARCHIVE_MAX_SIZE
+from tngsdk.project import jobs
+from tngsdk.project.jobs import JobQueue, QueueFull
 from flask_cors import CORS
-from os import listdir
-from os.path import isfile, join
 import ntpath
 
 log = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# clients may cache project files but have to revalidate them (conditional GET with ETag/Last-Modified)
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 CORS(app)
 app.wsgi_app = ProxyFix(app.wsgi_app)
 blueprint = Blueprint('api', __name__, url_prefix="/api")
@@ -61,6 +76,29 @@ api = Api(blueprint, version="0.1", title='5GTANGO tng-project API',
 app.register_blueprint(blueprint)
 api.add_namespace(api_v1)
 
+# loaded projects are cached per (worker) process and reused until their project.yml changes
+PROJECT_CACHE_SIZE = 64
+project_cache = ProjectCache(maxsize=PROJECT_CACHE_SIZE)
+# sorted index of project UUIDs for listing projects; only rescanned when projects are created or deleted
+project_index = ProjectIndex('projects')
+# max. number of projects or files per page in listings
+MAX_PAGE_SIZE = 1000
+
+# packaging jobs run in a bounded pool of processes per (worker) process; configured when starting the service
+# their status is stored in a hidden folder of the project such that any worker can report it
+JOB_DIR = cli_project.__job_dir_name__
+
+# max. size in bytes of each uploaded file (None: unlimited); configured when starting the service
+UPLOAD_MAX_SIZE = None
+# number of threads detecting the MIME types of files uploaded in bulk
+UPLOAD_JOBS = 4
+
+# default zip compression level of project downloads (balances CPU time and size)
+DOWNLOAD_COMPRESSLEVEL = 6
+package_jobs = JobQueue()
+# request counts and latencies per endpoint (per worker process); also provides the uptime for /pings
+request_metrics = RequestMetrics()
+
 
 # parser arguments: for input parameters sent to the API
 project_parser = api_v1.parser()
@@ -105,6 +143,18 @@ project_parser.add_argument("only_osm",
                             required=False,
                             default=False,
                             help="Generate only OSM descriptors")
+project_parser.add_argument("dedup",
+                            type=inputs.boolean,
+                            required=False,
+                            default=False,
+                            help="VNFs with identical image name and type share one VNFD")
+
+descriptors_parser = project_parser.copy()
+descriptors_parser.add_argument("format",
+                                choices=["json", "zip"],
+                                required=False,
+                                default="json",
+                                help="Return descriptors as JSON or as zip archive of yml files")
 
 file_upload_parser = api_v1.parser()
 file_upload_parser.add_argument("file",
@@ -117,19 +167,60 @@ file_upload_parser.add_argument("file_type",
                                 default=None,
                                 help="MIME type of an uploaded file")
 
+bulk_upload_parser = api_v1.parser()
+bulk_upload_parser.add_argument("files",
+                                location="files",
+                                type=FileStorage,
+                                action="append",
+                                required=False,
+                                help="Uploaded files to add to project (multiple parts; filenames may contain folders)")
+bulk_upload_parser.add_argument("archive",
+                                location="files",
+                                type=FileStorage,
+                                required=False,
+                                help="Zip or tar archive whose files are extracted and added to project")
+
+projects_list_parser = api_v1.parser()
+projects_list_parser.add_argument("name", required=False, help="Only list projects matching this pattern, eg, abc*")
+projects_list_parser.add_argument("limit", required=False, type=inputs.int_range(1, MAX_PAGE_SIZE),
+                                  help="Max. number of projects to return (default: all)")
+projects_list_parser.add_argument("cursor", required=False, help="Cursor to the next page (next_cursor of a response)")
+
+files_list_parser = api_v1.parser()
+files_list_parser.add_argument("type", required=False, help="Only list files with this MIME type")
+files_list_parser.add_argument("tag", required=False, help="Only list files with this tag")
+files_list_parser.add_argument("name", required=False,
+                               help="Only list files whose path matches this pattern, eg, *.yml")
+files_list_parser.add_argument("limit", required=False, type=inputs.int_range(1, MAX_PAGE_SIZE),
+                               help="Max. number of files to return (default: all)")
+files_list_parser.add_argument("cursor", required=False, help="Cursor to the next page (next_cursor of a response)")
+files_list_parser.add_argument("fields", required=False,
+                               help="Comma-separated fields to return per file (path, type, tags; default: all)")
+
 filename_parser = api_v1.parser()
 filename_parser.add_argument("filename", required=True, help="Filename of the file to remove")
 
+download_parser = api_v1.parser()
+download_parser.add_argument("level", required=False, type=int, choices=list(range(10)), default=None,
+                             help="Zip compression level from 0 (none) to 9. Default: based on Accept-Encoding")
+
+metrics_parser = api_v1.parser()
+metrics_parser.add_argument("format", required=False, choices=["prometheus", "json"], default="prometheus",
+                            help="Prometheus text format (for scraping) or JSON")
+
 package_parser = api_v1.parser()
 package_parser.add_argument("skip_validation", required=False, type=inputs.boolean, default=False,
                             help="If true, skip validation when packaging. Else validate first.")
 
 # models for marshaling return values from the API (also used for generating Swagger spec)
 ping_get_model = api_v1.model("PingGet", {
-    "alive_since": fields.String(description="system uptime", required=True)
+    "alive_since": fields.String(description="start time of the service (worker process)", required=True),
+    "uptime": fields.Float(description="seconds since the start of the service (worker process)")
 })
 projects_get_model = api_v1.model("ProjectsGet", {
-    "projects": fields.List(fields.String, description="list of all project UUIDs", required=True)
+    "projects": fields.List(fields.String, description="list of all project UUIDs", required=True),
+    "next_cursor": fields.String(description="cursor to the next page (if there are more projects)"),
+    "error_msg": fields.String(description="error message")
 })
 projects_post_model = api_v1.model("ProjectsPost", {
     "uuid": fields.String(description="project UUID", required=True),
@@ -153,11 +244,24 @@ file_model = api_v1.model("File", {
 files_get_model = api_v1.model("FilesGet", {
     "project_uuid": fields.String(description="project UUID"),
     "files": fields.List(fields.Nested(api_v1.models['File']), description="list of all project files"),
+    "next_cursor": fields.String(description="cursor to the next page (if there are more files)"),
     "error_msg": fields.String(description="error message")
 })
 files_post_model = api_v1.model("FilesPost", {
     "project_uuid": fields.String(description="project UUID"),
     "filename": fields.String(description="added file"),
+    "sha256": fields.String(description="SHA-256 hash of the uploaded file"),
+    "error_msg": fields.String(description="error message")
+})
+file_result_model = api_v1.model("FileResult", {
+    "filename": fields.String(description="uploaded file"),
+    "type": fields.String(description="MIME type of the added file"),
+    "sha256": fields.String(description="SHA-256 hash of the uploaded file (not for extracted files)"),
+    "error_msg": fields.String(description="error message if the file was not added")
+})
+files_bulk_post_model = api_v1.model("FilesBulkPost", {
+    "project_uuid": fields.String(description="project UUID"),
+    "files": fields.List(fields.Nested(file_result_model), description="result per uploaded file"),
     "error_msg": fields.String(description="error message")
 })
 files_delete_model = api_v1.model("FilesDelete", {
@@ -166,8 +270,21 @@ files_delete_model = api_v1.model("FilesDelete", {
     "error_msg": fields.String(description="error message")
 })
 
-package_post_model = api_v1.model("PackagePost", {
+stats_get_model = api_v1.model("StatsGet", {
+    "project_cache": fields.Raw(description="hits, misses, size, maxsize, and hit rate of the project cache")
+})
+metrics_get_model = api_v1.model("MetricsGet", {
+    "uptime": fields.Float(description="seconds since the start of the worker process"),
+    "in_flight": fields.Integer(description="number of requests currently being processed"),
+    "endpoints": fields.Raw(description="per endpoint: requests, status classes, latency sum and histogram"),
+    "project_cache": fields.Raw(description="hits, misses, size, maxsize, and hit rate of the project cache"),
+    "package_queue": fields.Raw(description="pending packaging jobs and their limits")
+})
+
+package_job_model = api_v1.model("PackageJob", {
     "project_uuid": fields.String(description="Project UUID"),
+    "job_id": fields.String(description="ID of the packaging job"),
+    "status": fields.String(description="Job status: queued, running, done, or failed"),
     "package_name": fields.String(description="Name of the created package"),
     "package_path": fields.String(description="Path of the created package"),
     "error_msg": fields.String(description="Error message")
@@ -184,36 +301,259 @@ def dump_swagger():
 
 
 # start REST API server
-def serve_forever(args, debug=True):
-    """Start serving (forever) the REST API with flask"""
-    # TODO replace this with WSGIServer for better performance
+def serve_forever(args, debug=False):
+    """Start serving (forever) the REST API with gunicorn (or flask's development server in debug mode)"""
     log.info("Starting tng-project in service mode")
     app.cliargs = args
-    app.run(host=args.service_address, port=args.service_port, debug=debug)
+    package_jobs.max_workers = args.package_workers
+    package_jobs.max_queued = args.package_queue
+    if args.max_upload_size:
+        global UPLOAD_MAX_SIZE
+        UPLOAD_MAX_SIZE = args.max_upload_size * 1024 * 1024
+    debug = debug or args.debug
+    if not debug:
+        try:
+            server = wsgi_server(app, args)
+        except ImportError:
+            log.warning("gunicorn not installed. Using flask's development server (single process)")
+        else:
+            server.run()
+            return
+    if args.workers > 1:
+        log.warning("Ignoring --workers {} with flask's development server".format(args.workers))
+    app.run(host=args.service_address, port=args.service_port, debug=debug, threaded=True)
+
+
+# uploaded file streamed into a hidden temp file in the project folder and hashed while it is received
+# saving it is an atomic rename to its final path (no second copy of large files, eg, VM images)
+class UploadFile:
+    def __init__(self, folder, max_size=None):
+        fd, self.path = tempfile.mkstemp(prefix=UPLOAD_TMP_PREFIX, suffix='.tmp', dir=folder)
+        self._file = os.fdopen(fd, 'wb+')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+
+    # read, seek, etc. of the temp file (used by werkzeug and for extracting archives)
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge("Uploaded file exceeds the max. size of {} bytes".format(self.max_size))
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    # move the temp file to its final path (replacing an existing file) and return its sha256 hash
+    def commit(self, path):
+        self._file.close()
+        try:
+            os.replace(self.path, path)
+        except OSError as ex:
+            if ex.errno != errno.EXDEV:
+                raise
+            # temp file on another file system (not in a project folder)
+            shutil.move(self.path, path)
+        self.path = None
+        return self.sha256
+
+    # remove the temp file if it wasn't committed
+    def discard(self):
+        self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+# request that streams uploaded files into the folder of the requested project (see UploadFile)
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        folder = tempfile.gettempdir()
+        project_uuid = (self.view_args or {}).get('project_uuid')
+        if project_uuid and os.path.isdir(os.path.join('projects', project_uuid)):
+            folder = os.path.join('projects', project_uuid)
+        if UPLOAD_MAX_SIZE is not None and content_length and content_length > UPLOAD_MAX_SIZE:
+            raise RequestEntityTooLarge("Uploaded file exceeds the max. size of {} bytes".format(UPLOAD_MAX_SIZE))
+        upload = UploadFile(folder, UPLOAD_MAX_SIZE)
+        self.__dict__.setdefault('_uploads', []).append(upload)
+        return upload
+
+    # remove temp files of uploads that were not saved (eg, rejected or failed requests)
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for upload in self.__dict__.get('_uploads', []):
+                upload.discard()
+
+
+app.request_class = UploadRequest
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = request_metrics.start()
+
+
+# requests are counted when their response is closed, ie, after streaming it (eg, downloads)
+# files passed directly to the server (eg, for sendfile) are never closed by flask and are counted right away
+# endpoints are identified by their URL rule (eg, /api/v1/projects/<string:project_uuid>), not the actual URL
+@app.after_request
+def finish_request_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        endpoint = '{} {}'.format(request.method, rule)
+        status_code = response.status_code
+        if response.direct_passthrough:
+            request_metrics.finish(endpoint, status_code, start)
+        else:
+            response.call_on_close(lambda: request_metrics.finish(endpoint, status_code, start))
+    return response
+
+
+# save an uploaded file to its path in the project and return its sha256 hash
+def save_upload(file, path):
+    if not isinstance(file.stream, UploadFile):
+        upload = UploadFile(os.path.dirname(path))
+        shutil.copyfileobj(file.stream, upload)
+        file.stream = upload
+    return file.stream.commit(path)
+
+
+# production WSGI server: gunicorn with multiple worker processes, each with multiple threads
+# gunicorn stops gracefully on SIGTERM/SIGINT: workers finish their requests (up to graceful_timeout)
+def wsgi_server(application, args):
+    import gunicorn.app.base
+
+    class _WSGIServer(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', '{}:{}'.format(args.service_address, args.service_port))
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            # gthread workers keep connections alive; sync workers (1 thread) close them after each request
+            self.cfg.set('worker_class', 'gthread' if args.threads > 1 else 'sync')
+            self.cfg.set('keepalive', args.keep_alive)
+            self.cfg.set('graceful_timeout', args.graceful_timeout)
+            # hanging workers are restarted; gthread workers stay responsive while their threads serve long requests,
+            # sync workers only while a request takes less than the timeout (packaging runs in the background)
+            self.cfg.set('timeout', args.worker_timeout)
+            # each worker reports its own uptime and metrics, not those of the master process importing the app
+            self.cfg.set('post_fork', lambda server, worker: request_metrics.reset())
+
+        def load(self):
+            return application
+
+    log.info("Serving on {}:{} with {} worker process(es) and {} thread(s) each"
+             .format(args.service_address, args.service_port, args.workers, args.threads))
+    return _WSGIServer()
+
+
+# opaque pagination cursors (URL-safe) encoding the last project or file path of the previous page
+def encode_cursor(key):
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError):
+        raise ValueError("Invalid cursor: {}".format(cursor))
+
+
+# ETag and Last-Modified of the project.yml in project_path (based on its stat; without loading the project)
+# returns the headers and whether the client's version (If-None-Match or If-Modified-Since) is still up to date
+def manifest_validators(project_path):
+    stamp = manifest_stamp(project_path)
+    if stamp is None:
+        return {}, False
+    etag = '{:x}-{:x}-{:x}'.format(*stamp)
+    last_modified = stamp[0] // 10**9
+    headers = {'ETag': '"{}"'.format(etag), 'Last-Modified': http_date(last_modified)}
+
+    # If-Modified-Since is ignored if If-None-Match is set (RFC 7232)
+    if request.if_none_match:
+        return headers, request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return headers, request.if_modified_since.timestamp() >= last_modified
+    return headers, False
 
 
 @api_v1.route("/pings")
 class Ping(Resource):
     @api_v1.marshal_with(ping_get_model)
     def get(self):
-        """Health check: Respond with current uptime"""
-        uptime = None
-        try:
-            uptime = str(subprocess.check_output("uptime")).strip()
-        except BaseException as e:
-            log.warning(str(e))
-        return {"alive_since": uptime}
+        """Health check: Respond with current uptime (without any I/O)"""
+        return {"alive_since": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(request_metrics.started)),
+                "uptime": request_metrics.uptime()}
+
+
+@api_v1.route("/stats")
+class Stats(Resource):
+    @api_v1.marshal_with(stats_get_model)
+    def get(self):
+        """Statistics for monitoring (of the responding worker process)"""
+        return {"project_cache": project_cache.stats()}
+
+
+@api_v1.route("/metrics")
+class Metrics(Resource):
+    @api_v1.expect(metrics_parser)
+    @api_v1.response(200, 'OK', metrics_get_model)
+    @api_v1.produces(['text/plain', 'application/json'])
+    def get(self):
+        """Request, cache, and packaging metrics for capacity planning (of the responding worker process)
+
+        In Prometheus text format for scraping (default) or as JSON (format=json)"""
+        args = metrics_parser.parse_args()
+        cache_stats = project_cache.stats()
+        if args['format'] == 'json':
+            metrics = request_metrics.snapshot()
+            metrics["project_cache"] = cache_stats
+            metrics["package_queue"] = {"depth": package_jobs.depth, "max_workers": package_jobs.max_workers,
+                                        "max_queued": package_jobs.max_queued}
+            return marshal(metrics, metrics_get_model)
+
+        text = request_metrics.exposition([
+            ('project_cache_hits_total', 'counter', 'Project cache hits.', cache_stats['hits']),
+            ('project_cache_misses_total', 'counter', 'Project cache misses (projects loaded from disk).',
+             cache_stats['misses']),
+            ('project_cache_size', 'gauge', 'Cached projects.', cache_stats['size']),
+            ('project_cache_hit_ratio', 'gauge', 'Share of project lookups served from the cache.',
+             cache_stats['hit_rate']),
+            ('package_queue_depth', 'gauge', 'Queued and running packaging jobs.', package_jobs.depth),
+            ('package_queue_capacity', 'gauge', 'Max. number of queued and running packaging jobs.',
+             package_jobs.max_workers + package_jobs.max_queued),
+        ])
+        return Response(text, content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @api_v1.route("/projects")
 class Projects(Resource):
+    @api_v1.expect(projects_list_parser)
     @api_v1.marshal_with(projects_get_model)
+    @api_v1.response(400, "Invalid cursor")
     def get(self):
-        """Get list of projects"""
-        log.info("GET to /projects. Loading available projects")
+        """Get list of projects (sorted; paginated if a limit is set)"""
+        args = projects_list_parser.parse_args()
+        log.info("GET to /projects with args: {}".format(args))
         os.makedirs('projects', exist_ok=True)
-        project_dirs = [name for name in os.listdir('projects') if os.path.isdir(os.path.join('projects', name))]
-        return {'projects': project_dirs}
+        try:
+            after = decode_cursor(args['cursor'])
+        except ValueError as ex:
+            return {'error_msg': str(ex)}, 400
+        project_dirs, next_cursor = project_index.list(name=args['name'], after=after, limit=args['limit'])
+        return {'projects': project_dirs, 'next_cursor': encode_cursor(next_cursor)}
 
     @api_v1.expect(project_parser)
     @api_v1.marshal_with(projects_post_model)
@@ -235,6 +575,9 @@ class Projects(Resource):
             elif k == 'only_osm':
                 if v:
                     dgn_args.append('--osm')
+            elif k == 'dedup':
+                if v:
+                    dgn_args.append('--dedup')
             elif k == 'image_names' or k == 'image_types':
                 if v is not None:
                     dgn_args.append('--' + k)
@@ -252,8 +595,8 @@ class Projects(Resource):
         cli_args = cli.parse_args(dgn_args)
         project = cli.dispatch(cli_args)
 
-        project_path = os.path.join('projects', project_uuid)
-        project_files = [f for f in listdir(project_path) if isfile(join(project_path, f))]
+        # files listed in the manifest (not hidden metadata like the lock file or MIME cache)
+        project_files = [project.__descriptor_name__] + [f['path'] for f in project.project_config['files']]
         info = {'uuid': project_uuid, "error_msg": project.error_msg, "files": []}
         files = []
         for f in project_files:
@@ -263,6 +606,31 @@ class Projects(Resource):
         return info
 
 
+@api_v1.route("/descriptors")
+class Descriptors(Resource):
+    @api_v1.expect(descriptors_parser)
+    @api_v1.response(200, 'OK')
+    @api_v1.response(400, "Invalid descriptorgen args")
+    def post(self):
+        """Generate descriptors with the given args and return them directly without creating a project"""
+        args = descriptors_parser.parse_args()
+        log.info("POST to /descriptors with args: {}".format(args))
+        try:
+            descriptors = descriptorgen.generate_in_memory(
+                author=args['author'], vendor=args['vendor'], name=args['name'], description=args['description'],
+                vnfs=args['vnfs'], tango=args['only_tango'], osm=args['only_osm'], dedup=args['dedup'],
+                image_names=args['image_names'].split(' ') if args['image_names'] else [],
+                image_types=args['image_types'].split(' ') if args['image_types'] else [])
+        except ValueError as ex:
+            log.error("Could not generate descriptors: {}".format(ex))
+            return {'error_msg': str(ex)}, 400
+
+        if args['format'] == 'zip':
+            return send_file(descriptorgen.zip_descriptors(descriptors), mimetype='application/zip',
+                             as_attachment=True, attachment_filename='descriptors.zip')
+        return {'descriptors': descriptors, 'error_msg': None}
+
+
 @api_v1.route("/projects/<string:project_uuid>")
 class Project(Resource):
     @api_v1.marshal_with(project_get_model)
@@ -276,8 +644,15 @@ class Project(Resource):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
 
-        project = cli_project.load_project(project_path)
-        return {"project_uuid": project_uuid, "manifest": project.project_config, "error_msg": project.error_msg}
+        headers, not_modified = manifest_validators(project_path)
+        if not_modified:
+            return None, 304, headers
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+            # copy: the manifest is serialized after releasing the project
+            manifest = copy.deepcopy(project.project_config)
+            return {"project_uuid": project_uuid, "manifest": manifest, "error_msg": project.error_msg}, 200, headers
 
     @api_v1.marshal_with(project_delete_model)
     @api_v1.response(200, 'OK')
@@ -290,7 +665,9 @@ class Project(Resource):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
 
-        shutil.rmtree(project_path)
+        with project_cache.project(project_uuid, project_path):
+            shutil.rmtree(project_path)
+            project_cache.invalidate(project_uuid)
         return {"project_uuid": project_uuid}
 
 
@@ -302,30 +679,60 @@ class ProjectSpecificFile(Resource):
         projects_dir = os.path.realpath('projects')
         project_path = os.path.join(projects_dir, project_uuid)
         log.debug("Project path: {}".format(project_path))
-        return send_from_directory(project_path, file_name)
+        # internal files (MIME cache, lock, jobs, uploads in progress) are not served; project.yml is
+        if file_name in UPLOAD_RESERVED_NAMES - {cli_project.__descriptor_name__} \
+                or file_name.startswith(UPLOAD_TMP_PREFIX):
+            log.error("Not serving internal file {} of project {}".format(file_name, project_uuid))
+            return {'error_msg': "File not found: {}".format(file_name)}, 404
+        # answers If-None-Match/If-Modified-Since with 304 based on the file's ETag and mtime
+        return send_from_directory(project_path, file_name, conditional=True)
 
 
 @api_v1.route("/projects/<string:project_uuid>/files")
 class ProjectFiles(Resource):
     # get list of project files
-    @api_v1.marshal_with(files_get_model)
-    @api_v1.response(200, 'OK')
+    @api_v1.expect(files_list_parser)
+    @api_v1.response(200, 'OK', files_get_model)
+    @api_v1.response(400, "Invalid cursor or fields")
     @api_v1.response(404, "Project not found")
     def get(self, project_uuid):
-        """Get a list of files in the specified project"""
-        log.info("GET to /projects/{}/files".format(project_uuid))
+        """Get a list of files in the specified project (filtered and paginated if requested)"""
+        args = files_list_parser.parse_args()
+        log.info("GET to /projects/{}/files with args: {}".format(project_uuid, args))
         project_path = os.path.join('projects', project_uuid)
         if not os.path.isdir(project_path):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
 
-        project = cli_project.load_project(project_path)
-        return {"project_uuid": project_uuid, "files": project.project_config["files"]}
+        # sparse fields: mask of the returned fields of each file
+        mask = None
+        if args['fields']:
+            file_fields = [f.strip() for f in args['fields'].split(',')]
+            if not set(file_fields) <= set(file_model):
+                return {'error_msg': "Invalid fields {}. Available: {}".format(file_fields, list(file_model))}, 400
+            mask = 'project_uuid,next_cursor,error_msg,files{{{}}}'.format(','.join(file_fields))
+
+        headers, not_modified = manifest_validators(project_path)
+        if not_modified:
+            return None, 304, headers
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+            try:
+                files, next_cursor = project.list_files(type=args['type'], tag=args['tag'], name=args['name'],
+                                                        after=decode_cursor(args['cursor']), limit=args['limit'])
+            except ValueError as ex:
+                return {'error_msg': str(ex)}, 400
+            # marshal while holding the project (files are not copied)
+            result = {"project_uuid": project_uuid, "files": files, "next_cursor": encode_cursor(next_cursor)}
+            return marshal(result, files_get_model, mask=mask), 200, headers
 
     @api_v1.expect(file_upload_parser)
     @api_v1.marshal_with(files_post_model)
     @api_v1.response(200, 'OK')
+    @api_v1.response(400, "Invalid file name")
     @api_v1.response(404, "Project not found")
+    @api_v1.response(413, "File too large")
     def post(self, project_uuid):
         """Upload and add a file to the specified project"""
         args = file_upload_parser.parse_args()
@@ -336,19 +743,27 @@ class ProjectFiles(Resource):
         if not os.path.isdir(project_path):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
-        project = cli_project.load_project(project_path)
-
-        # check if file already exists
-        file = args["file"]
-        if os.path.isfile(os.path.join(project_path, file.filename)):
-            log.warning("Overriding existing file {}".format(file.filename))
-
-        # save uploaded file to project and add to project manifest
-        log.debug("Adding uploaded file {} to project with UUID {}".format(file.filename, project_uuid))
-        file.save(os.path.join(project_path, file.filename))
-        project.add_file(os.path.join(project_path, file.filename), args["file_type"])
-
-        return {"project_uuid": project_uuid, "filename": file.filename, "error_msg": project.error_msg}
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+
+            # check if the file name is valid (inside the project) and if the file already exists
+            file = args["file"]
+            path = upload_path(project_path, file.filename)
+            if path is None:
+                log.error("Rejecting uploaded file with invalid path {}".format(file.filename))
+                return {"project_uuid": project_uuid, "error_msg": "Invalid path: {}".format(file.filename)}, 400
+            if os.path.isfile(path):
+                log.warning("Overriding existing file {}".format(file.filename))
+
+            # save uploaded file to project and add to project manifest
+            log.debug("Adding uploaded file {} to project with UUID {}".format(file.filename, project_uuid))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            sha256 = save_upload(file, path)
+            project.add_file(path, args["file_type"])
+
+            return {"project_uuid": project_uuid, "filename": file.filename, "sha256": sha256,
+                    "error_msg": project.error_msg}
 
     @api_v1.expect(filename_parser)
     @api_v1.marshal_with(files_delete_model)
@@ -364,58 +779,128 @@ class ProjectFiles(Resource):
         if not os.path.isdir(project_path):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
-        project = cli_project.load_project(project_path)
-
-        # check if file exists
-        filename = args["filename"]
-        if not os.path.isfile(os.path.join(project_path, filename)):
-            log.error("File {} not found in project with UUID {}".format(filename, project_uuid))
-            return {"project_uuid": project_uuid, "error_msg": "File {} not found in project".format(filename)}, 404
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+
+            # check if file exists
+            filename = args["filename"]
+            if not os.path.isfile(os.path.join(project_path, filename)):
+                log.error("File {} not found in project with UUID {}".format(filename, project_uuid))
+                return {"project_uuid": project_uuid,
+                        "error_msg": "File {} not found in project".format(filename)}, 404
+
+            # remove file from project manifest and delete it
+            project.remove_file(os.path.join(project_path, filename))
+            os.remove(os.path.join(project_path, filename))
+            return {"project_uuid": project_uuid, "removed_file": filename, "error_msg": project.error_msg}
+
+
+@api_v1.route("/projects/<string:project_uuid>/files/bulk")
+class ProjectFilesBulk(Resource):
+    @api_v1.expect(bulk_upload_parser)
+    @api_v1.marshal_with(files_bulk_post_model)
+    @api_v1.response(200, 'OK')
+    @api_v1.response(400, "No files or invalid archive")
+    @api_v1.response(404, "Project not found")
+    def post(self, project_uuid):
+        """Upload many files (or a zip/tar archive) and add them to the specified project at once"""
+        args = bulk_upload_parser.parse_args()
+        log.info("POST to /projects/{}/files/bulk with args: {}".format(project_uuid, args))
+        if not args["files"] and args["archive"] is None:
+            return {"project_uuid": project_uuid, "error_msg": "No files or archive uploaded"}, 400
 
-        # remove file from project manifest and delete it
-        project.remove_file(os.path.join(project_path, filename))
-        os.remove(os.path.join(project_path, filename))
-        return {"project_uuid": project_uuid, "removed_file": filename, "error_msg": project.error_msg}
+        # try to load the project
+        project_path = os.path.join('projects', project_uuid)
+        if not os.path.isdir(project_path):
+            log.error("No project found with name/UUID {}".format(project_uuid))
+            return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+
+            # save all files first: (filename, path, error); path is None for rejected files
+            # the archive is extracted first such that nothing is saved if it is invalid
+            saved = []
+            hashes = {}
+            if args["archive"] is not None:
+                try:
+                    # the extracted files are limited like uploaded files (or by default, eg, against zip bombs)
+                    saved.extend(extract_archive(args["archive"].stream, project_path,
+                                                 max_size=UPLOAD_MAX_SIZE or ARCHIVE_MAX_SIZE))
+                except ValueError as ex:
+                    log.error("Invalid archive {}: {}".format(args["archive"].filename, ex))
+                    return {"project_uuid": project_uuid, "error_msg": str(ex)}, 400
+
+            for file in args["files"] or []:
+                path = upload_path(project_path, file.filename)
+                if path is None:
+                    log.warning("Rejecting uploaded file with invalid path {}".format(file.filename))
+                    saved.append((file.filename, None, "Invalid path"))
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                hashes[path] = save_upload(file, path)
+                saved.append((file.filename, path, None))
+
+            # then detect MIME types in parallel and write project.yml once
+            project.jobs = UPLOAD_JOBS
+            try:
+                added = dict(project.add_files([path for _, path, _ in saved if path is not None]))
+            finally:
+                project.jobs = 1
+            results = [{"filename": name, "type": added.get(path), "sha256": hashes.get(path), "error_msg": error}
+                       for name, path, error in saved]
+            return {"project_uuid": project_uuid, "files": results, "error_msg": project.error_msg}
 
 
-# not needed and implementation not completed; just left for possible future use
-@api_v1.deprecated
 @api_v1.route("/projects/<string:project_uuid>/download")
 class ProjectDownload(Resource):
-    """Download the specified project as zip file. Not completely implemented. Use packager instead."""
+    @api_v1.expect(download_parser)
     @api_v1.response(200, 'OK')
     @api_v1.response(404, "Project not found")
+    @api_v1.produces(['application/zip'])
     def get(self, project_uuid):
-        log.info("GET to /projects/{}/download".format(project_uuid))
+        """Download the project.yml and all files of the specified project as zip file (streamed while zipping)"""
+        args = download_parser.parse_args()
+        log.info("GET to /projects/{}/download with args: {}".format(project_uuid, args))
 
         # try to load the project
         project_path = os.path.join('projects', project_uuid)
         if not os.path.isdir(project_path):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
-        # project = cli_project.load_project(project_path)
+        with project_cache.project(project_uuid, project_path) as project:
+            if project is None:
+                return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
+            stream = project.zip_stream(prefix=project_uuid + '/', compresslevel=download_compresslevel(args['level']))
+
+        return Response(stream, mimetype='application/zip',
+                        headers={'Content-Disposition': 'attachment; filename={}.zip'.format(project_uuid)})
 
-        # zip the project
-        zip_path = os.path.join('projects', project_uuid + '.zip')
-        zipped_project = zipfile.ZipFile(zip_path, 'w')
-        for root, dirs, files in os.walk(project_path):
-            for f in files:
-                zipped_project.write(os.path.join(root, f), os.path.relpath(os.path.join(root, f), 'projects'))
-        zipped_project.close()
 
-        # TODO: return the zipped project; async?
-        return "not implemented", 501
+# zip compression level of a download: the requested level or based on the Accept-Encoding header
+# clients that don't accept compressed content (eg, "Accept-Encoding: identity") get uncompressed zip entries
+def download_compresslevel(level):
+    if level is not None:
+        return level
+    if 'Accept-Encoding' not in request.headers:
+        return DOWNLOAD_COMPRESSLEVEL
+    if request.accept_encodings.quality('gzip') or request.accept_encodings.quality('deflate'):
+        return DOWNLOAD_COMPRESSLEVEL
+    return 0
 
 
 @api_v1.route("/projects/<string:project_uuid>/package")
 class ProjectPackage(Resource):
     @api_v1.expect(package_parser)
-    @api_v1.marshal_with(package_post_model)
-    @api_v1.response(200, 'OK')
+    @api_v1.marshal_with(package_job_model)
+    @api_v1.response(202, 'Packaging job queued')
     @api_v1.response(404, "Project not found")
+    @api_v1.response(429, "Too many packaging jobs. Try again later")
     @api_v1.response(503, "tng-sdk-package not installed")
     def post(self, project_uuid):
-        """Package (and validate) the specified project using tng-sdk-package (if installed)"""
+        """Start packaging (and validating) the specified project using tng-sdk-package (if installed).
+        Returns the ID of the packaging job, whose status can be queried."""
         args = package_parser.parse_args()
         log.info("POST to /projects/{}/package with args: {}".format(project_uuid, args))
 
@@ -425,28 +910,51 @@ class ProjectPackage(Resource):
             log.error("No project found with name/UUID {}".format(project_uuid))
             return {'error_msg': "Project not found: {}".format(project_uuid)}, 404
 
-        # try to import the packager if it's installed
-        try:
-            import tngsdk.package
-        except BaseException as ex:
+        # check if the packager is installed (it's imported in the packaging process)
+        if importlib.util.find_spec('tngsdk.package') is None:
             log.error("Cancel packaging: tng-sdk-package not installed")
-            log.debug(ex)
             return {'error_msg': "Cancel packaging: tng-sdk-package not installed"}, 503
 
-        # call the packager
-        pkg_args = [
-            '--package', project_path,
-            '--output', project_path,
-        ]
-        if args['skip_validation']:
-            log.debug("Skipping validation")
-            pkg_args.append('--skip-validation')
-        r = tngsdk.package.run(pkg_args)
-        log.debug(r)
-        if r.error is not None:
-            return {'project_uuid': project_uuid, 'package_name': None, 'package_path': None,
-                    'error_msg': "Package error: {}".format(r.error)}
-        pkg_path = r.metadata.get("_storage_location")
-        pkg_name = ntpath.basename(pkg_path)
-        log.debug("Package name {} and path {}".format(pkg_name, pkg_path))
-        return {'project_uuid': project_uuid, 'package_name': pkg_name, 'package_path': pkg_path, 'error_msg': None}
+        try:
+            job_id = package_jobs.submit(os.path.join(project_path, JOB_DIR), package_project, project_path,
+                                         args['skip_validation'])
+        except QueueFull as ex:
+            log.warning("Rejecting packaging of project {}: {}".format(project_uuid, ex))
+            return {'project_uuid': project_uuid, 'error_msg': "Too many packaging jobs. Try again later"}, 429
+        return {'project_uuid': project_uuid, 'job_id': job_id, 'status': 'queued', 'error_msg': None}, 202
+
+
+@api_v1.route("/projects/<string:project_uuid>/package/<string:job_id>")
+class ProjectPackageJob(Resource):
+    @api_v1.marshal_with(package_job_model)
+    @api_v1.response(200, 'OK')
+    @api_v1.response(404, "Project or job not found")
+    def get(self, project_uuid, job_id):
+        """Get the status (queued, running, done, failed) and result of the specified packaging job"""
+        log.info("GET to /projects/{}/package/{}".format(project_uuid, job_id))
+        status = jobs.load_job(os.path.join('projects', project_uuid, JOB_DIR), job_id)
+        if status is None:
+            log.error("No packaging job {} found for project {}".format(job_id, project_uuid))
+            return {'error_msg': "Packaging job not found: {}".format(job_id)}, 404
+        status['project_uuid'] = project_uuid
+        return status
+
+
+# package the project with tng-sdk-package; executed in a packaging worker process (see package_jobs)
+def package_project(project_path, skip_validation):
+    import tngsdk.package
+    pkg_args = [
+        '--package', project_path,
+        '--output', project_path,
+    ]
+    if skip_validation:
+        log.debug("Skipping validation")
+        pkg_args.append('--skip-validation')
+    r = tngsdk.package.run(pkg_args)
+    log.debug(r)
+    if r.error is not None:
+        return {'package_name': None, 'package_path': None, 'error_msg': "Package error: {}".format(r.error)}
+    pkg_path = r.metadata.get("_storage_location")
+    pkg_name = ntpath.basename(pkg_path)
+    log.debug("Package name {} and path {}".format(pkg_name, pkg_path))
+    return {'package_name': pkg_name, 'package_path': pkg_path, 'error_msg': None}
@@ -35,6 +35,7 @@
 import pytest
 import os
 import shutil
+import zipfile
 import yaml
 import tngsdk.cli as cli
 import tngsdk.descriptorgen.descriptorgen as dgn
@@ -136,3 +137,147 @@ class TestDescriptorgenCLI:
         assert not os.path.isfile(os.path.join('test-descriptorgen', 'tango_vnfd0.yml'))
 
         shutil.rmtree('test-descriptorgen')
+
+    # parsed default descriptors are cached and not modified by generating descriptors
+    def test_cached_templates(self):
+        from tngsdk.descriptorgen import templates
+        tango_nsd = templates.get('tango_default_nsd.yml')
+        args = cli.parse_args(['--vnfs', '3', '--author', 'test.author', '-o', 'test-descriptorgen'])
+        dgn.generate(args)
+        dgn.generate(args)
+
+        assert templates.load('tango_default_nsd.yml') == tango_nsd
+        assert templates.load('tango_default_vnfd.yml')['author'] != 'test.author'
+        with open(os.path.join('test-descriptorgen', 'tango_nsd.yml'), 'r') as f:
+            assert len(yaml.load(f, Loader=yaml.FullLoader)['network_functions']) == 3
+
+        shutil.rmtree('test-descriptorgen')
+
+    # streaming descriptors to disk (in parallel processes) results in the same files
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_stream_descriptors(self, jobs):
+        dgn.generate(cli.parse_args(['--vnfs', '5', '-o', 'test-descriptorgen']))
+        dgn.generate(cli.parse_args(['--vnfs', '5', '-o', 'test-descriptorgen-stream', '--stream', '-j', str(jobs)]))
+
+        files = sorted(os.listdir('test-descriptorgen'))
+        assert files == sorted(os.listdir('test-descriptorgen-stream'))
+        assert len(files) == 12
+        for f in files:
+            with open(os.path.join('test-descriptorgen', f)) as f1, \
+                    open(os.path.join('test-descriptorgen-stream', f)) as f2:
+                assert f1.read() == f2.read()
+
+        shutil.rmtree('test-descriptorgen')
+        shutil.rmtree('test-descriptorgen-stream')
+
+    # VNFs with identical images share one VNFD, which is referenced multiple times in the NSD
+    @pytest.mark.parametrize('stream', [False, True])
+    def test_dedup_vnfds(self, stream):
+        args = ['--vnfs', '4', '--image_names', 'img0', 'img0', 'img1', 'img0', '--image_types', 'docker', 'docker',
+                'docker', 'qcow2', '-o', 'test-descriptorgen', '--dedup']
+        dgn.generate(cli.parse_args(args + (['--stream', '-j', '2'] if stream else [])))
+        assert sorted(os.listdir('test-descriptorgen')) == [
+            'osm_nsd.yml', 'osm_vnfd0.yml', 'osm_vnfd2.yml', 'osm_vnfd3.yml',
+            'tango_nsd.yml', 'tango_vnfd0.yml', 'tango_vnfd2.yml', 'tango_vnfd3.yml']
+
+        with open(os.path.join('test-descriptorgen', 'tango_nsd.yml'), 'r') as f:
+            tango_nsd = yaml.load(f, Loader=yaml.FullLoader)
+        assert [nf['vnf_id'] for nf in tango_nsd['network_functions']] == ['vnf0', 'vnf1', 'vnf2', 'vnf3']
+        assert [nf['vnf_name'] for nf in tango_nsd['network_functions']] == \
+            ['default-vnf0', 'default-vnf0', 'default-vnf2', 'default-vnf3']
+        with open(os.path.join('test-descriptorgen', 'osm_nsd.yml'), 'r') as f:
+            osm_nsd = yaml.load(f, Loader=yaml.FullLoader)
+        assert [vnf['vnfd-id-ref'] for vnf in osm_nsd['constituent-vnfd']] == \
+            ['default-vnf0', 'default-vnf0', 'default-vnf2', 'default-vnf3']
+        assert [vnf['member-vnf-index'] for vnf in osm_nsd['constituent-vnfd']] == [0, 1, 2, 3]
+
+        shutil.rmtree('test-descriptorgen')
+
+    # in-memory generation returns the same descriptors as saving them to disk, without writing files
+    def test_generate_in_memory(self):
+        dgn.generate(cli.parse_args(['--vnfs', '3', '--image_names', 'img0', 'img0', '--dedup',
+                                     '-o', 'test-descriptorgen']))
+        descriptors = dgn.generate_in_memory(vnfs=3, image_names=['img0', 'img0'], dedup=True)
+        assert list(descriptors) == ['tango_nsd.yml', 'tango_vnfd0.yml', 'tango_vnfd2.yml',
+                                     'osm_nsd.yml', 'osm_vnfd0.yml', 'osm_vnfd2.yml']
+        assert sorted(descriptors) == sorted(os.listdir('test-descriptorgen'))
+        for name, content in dgn.serialize_descriptors(descriptors).items():
+            with open(os.path.join('test-descriptorgen', name), 'rb') as f:
+                assert f.read() == content
+        shutil.rmtree('test-descriptorgen')
+
+        with zipfile.ZipFile(dgn.zip_descriptors(dgn.generate_in_memory(flavors=['osm']))) as archive:
+            assert archive.namelist() == ['osm_nsd.yml', 'osm_vnfd0.yml']
+        with pytest.raises(ValueError):
+            dgn.generate_in_memory(flavors=['unknown'])
+        with pytest.raises(ValueError):
+            dgn.generate_in_memory(unknown_option=1)
+        assert not os.path.exists('tango_nsd.yml')
+
+    # regenerating descriptors only rewrites files whose content changed
+    @pytest.mark.parametrize('stream', [False, True])
+    def test_skip_unchanged_descriptors(self, stream):
+        args = ['--vnfs', '2', '-o', 'test-descriptorgen'] + (['--stream'] if stream else [])
+        assert dgn.generate_service(cli.parse_args(args)) == (6, 0)
+        nsd_path = os.path.join('test-descriptorgen', 'tango_nsd.yml')
+        vnfd_path = os.path.join('test-descriptorgen', 'tango_vnfd0.yml')
+        os.utime(nsd_path, ns=(0, 0))
+        os.utime(vnfd_path, ns=(0, 0))
+
+        # the author is only set in tango descriptors; more VNFs add VNFDs and change the NSDs
+        assert dgn.generate_service(cli.parse_args(args)) == (0, 6)
+        assert dgn.generate_service(cli.parse_args(args + ['--author', 'new.author'])) == (3, 3)
+        assert os.stat(nsd_path).st_mtime_ns > 0
+        os.utime(nsd_path, ns=(0, 0))
+        assert dgn.generate_service(cli.parse_args(args + ['--author', 'new.author', '--vnfs', '3'])) == (4, 4)
+        assert os.stat(vnfd_path).st_mtime_ns > 0 and os.stat(nsd_path).st_mtime_ns > 0
+        shutil.rmtree('test-descriptorgen')
+
+    # generate flavors in parallel processes and select flavors explicitly; totals are logged by the parent
+    def test_generate_flavors(self, monkeypatch, caplog):
+        monkeypatch.setattr(dgn, 'PARALLEL_MIN_VNFS', 2)
+        caplog.set_level('INFO', logger=dgn.__name__)
+        assert dgn.generate_service(cli.parse_args(['--vnfs', '2', '-o', 'test-descriptorgen'])) == (6, 0)
+        assert "['tango', 'osm'] at test-descriptorgen: 6 written, 0 unchanged" in caplog.text
+        assert os.path.isfile(os.path.join('test-descriptorgen', 'tango_vnfd1.yml'))
+        assert os.path.isfile(os.path.join('test-descriptorgen', 'osm_vnfd1.yml'))
+        shutil.rmtree('test-descriptorgen')
+
+        dgn.generate(cli.parse_args(['--flavors', 'osm', '-o', 'test-descriptorgen']))
+        assert sorted(os.listdir('test-descriptorgen')) == ['osm_nsd.yml', 'osm_vnfd0.yml']
+        shutil.rmtree('test-descriptorgen')
+
+    # without mp_context (Python 3.6) flavors are generated sequentially instead of in forked processes
+    def test_generate_flavors_sequential(self, monkeypatch):
+        process_pool = dgn.ProcessPoolExecutor
+        monkeypatch.setattr(dgn, 'PARALLEL_MIN_VNFS', 2)
+        monkeypatch.setattr(dgn, 'ProcessPoolExecutor', lambda max_workers=None: process_pool(max_workers))
+        args = cli.parse_args(['--vnfs', '2', '-o', 'test-descriptorgen'])
+        assert dgn.generate_service(args) == (6, 0)
+        assert os.path.isfile(os.path.join('test-descriptorgen', 'osm_vnfd1.yml'))
+        shutil.rmtree('test-descriptorgen')
+
+    # generate descriptors for multiple services listed in a yml or csv spec file
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_generate_batch(self, tmpdir, jobs):
+        spec_yml = tmpdir.join('spec.yml')
+        spec_yml.write(yaml.dump({'services': [
+            {'name': 'service-a', 'vendor': 'test.vendor', 'vnfs': 2},
+            {'name': 'service-b', 'vnfs': 1, 'image_names': ['img0'], 'flavors': ['tango'], 'output': 'b'}
+        ]}))
+        spec_csv = tmpdir.join('spec.csv')
+        spec_csv.write('name,vnfs,image_names,flavors\nservice-c,2,img0 img1,osm\n')
+
+        for spec in [spec_yml, spec_csv]:
+            dgn.generate(cli.parse_args(['--spec', str(spec), '-o', 'test-descriptorgen', '-j', str(jobs)]))
+
+        with open(os.path.join('test-descriptorgen', 'service-a', 'tango_nsd.yml'), 'r') as f:
+            tango_nsd = yaml.load(f, Loader=yaml.FullLoader)
+            assert tango_nsd['vendor'] == 'test.vendor'
+            assert len(tango_nsd['network_functions']) == 2
+        assert sorted(os.listdir(os.path.join('test-descriptorgen', 'b'))) == ['tango_nsd.yml', 'tango_vnfd0.yml']
+        with open(os.path.join('test-descriptorgen', 'service-c', 'osm_vnfd1.yml'), 'r') as f:
+            osm_vnfd = yaml.load(f, Loader=yaml.FullLoader)
+            assert osm_vnfd['vnfd-catalog']['vnfd'][0]['vdu'][0]['image'] == 'img1'
+
+        shutil.rmtree('test-descriptorgen')
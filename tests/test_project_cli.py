@@ -34,7 +34,9 @@
 
 import pytest
 import os
+import sys
 import shutil
+import subprocess
 import yaml
 import tngsdk.project.workspace as workspace
 from tngsdk.project.workspace import Workspace
@@ -146,3 +148,22 @@ class TestProjectCLI:
             project_yml = yaml.load(open_file, Loader=yaml.FullLoader)
             project_files = [f['path'] for f in project_yml['files']]
             assert 'sample.txt' not in project_files
+
+    # the CLI entry points must not import the REST stack or other heavy modules at startup
+    @pytest.mark.parametrize('module', ['tngsdk.project', 'tngsdk.project.workspace',
+                                        'tngsdk.descriptorgen.descriptorgen'])
+    def test_cli_import_time(self, module):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                                env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        # lines: "import time: self [us] | cumulative | imported package"
+        imports = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+                _, cumulative, name = line.split('|')
+                imports[name.strip()] = int(cumulative)
+        lazy_modules = ['flask', 'flask_restplus', 'flask_cors', 'werkzeug', 'tabulate', 'tngsdk.rest',
+                        'tngsdk.descriptorgen.plugins']
+        assert not [m for m in lazy_modules if m in imports]
+        # generous budget (in microseconds) to catch regressions, eg, by accidentally importing flask again
+        assert imports[module] < 1000000
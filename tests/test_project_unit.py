@@ -34,10 +34,22 @@
 
 import pytest
 import os
+import io
+import time
+import glob
 import shutil
+import tarfile
+import zipfile
+import threading
+import multiprocessing
+from unittest.mock import patch
 import tngsdk.project.workspace as workspace
 from tngsdk.project.workspace import Workspace
-from tngsdk.project.project import Project
+from tngsdk.project.project import Project, upload_path, extract_archive, _extract_members
+from tngsdk.project.cache import ProjectCache, ProjectIndex
+from tngsdk.project import jobs
+from tngsdk.project.jobs import JobQueue, QueueFull
+from tngsdk.metrics import RequestMetrics
 
 
 class TestProjectUnit:
@@ -58,6 +70,13 @@ class TestProjectUnit:
         yield 'test-ws'
         shutil.rmtree('test-ws')
 
+    # copy of 'example-project' in a temporary folder: changing it creates hidden metadata files
+    @pytest.fixture
+    def example_project(self, tmpdir):
+        path = str(tmpdir.join('example-project'))
+        shutil.copytree('example-project', path)
+        return path
+
     # test descriptors of project 'example-project'
     def test_example_project_descriptors(self, workspace):
         ws = Workspace.load_workspace(workspace)
@@ -69,3 +88,394 @@ class TestProjectUnit:
 
         nsds = example_project.get_nsds()
         assert nsds == ['tango_nsd.yml']
+
+    # add multiple files in batch mode: project.yml should only be written once
+    def test_batch_add_files(self, workspace):
+        ws = Workspace.load_workspace(workspace)
+        project = Project(ws, 'test-batch-project')
+        os.makedirs('test-batch-project')
+        for i in range(5):
+            with open(os.path.join('test-batch-project', 'file{}.txt'.format(i)), 'w') as f:
+                f.write('sample text')
+
+        with patch.object(Project, '_write_prj_yml', autospec=True) as m_write:
+            project.add_file(os.path.join('test-batch-project', '*.txt'))
+            assert m_write.call_count == 1
+        assert len(project.get_file_paths('text/plain')) == 5
+
+        # removing within a batch also writes project.yml only once at the end
+        with patch.object(Project, '_write_prj_yml', autospec=True) as m_write:
+            with project.batch():
+                project.remove_file(os.path.join('test-batch-project', 'file0.txt'))
+                project.remove_file(os.path.join('test-batch-project', 'file1.txt'))
+                assert m_write.call_count == 0
+            assert m_write.call_count == 1
+        assert len(project.get_file_paths('text/plain')) == 3
+        shutil.rmtree('test-batch-project')
+
+    # the path, type and tag index is kept up-to-date on add, remove and type changes
+    def test_file_index(self, workspace, example_project):
+        ws = Workspace.load_workspace(workspace)
+        project = Project.load_project(example_project, workspace=ws)
+        assert project.get_file_paths_by_tag('etsi.osm') == ['osm_nsd.yml', 'osm_vnfd0.yml']
+
+        # re-adding with a different type updates the existing entry instead of duplicating it
+        with patch.object(Project, '_write_prj_yml', autospec=True):
+            project.add_file(os.path.join(example_project, 'tango_vnfd0.yml'), type='text/yaml')
+            assert project.get_vnfds() == []
+            assert project.get_file_paths('text/yaml') == ['tango_vnfd0.yml']
+            assert project.get_file_paths_by_tag('eu.5gtango') == ['tango_nsd.yml']
+
+            project.remove_file(os.path.join(example_project, 'osm_nsd.yml'))
+            paths = [f['path'] for f in project.project_config['files']]
+            assert paths == ['osm_vnfd0.yml', 'tango_nsd.yml', 'tango_vnfd0.yml']
+            assert project.get_nsds(type='application/vnd.etsi.osm.nsd') == []
+
+    # detected MIME types of descriptors are cached on disk and reused until the file changes
+    def test_mime_cache(self, workspace):
+        ws = Workspace.load_workspace(workspace)
+        os.makedirs('test-cache-project')
+        project = Project(ws, 'test-cache-project')
+        nsd_path = os.path.join('test-cache-project', 'nsd.yml')
+        shutil.copy(os.path.join('example-project', 'tango_nsd.yml'), nsd_path)
+        project.add_file(nsd_path)
+        assert os.path.isfile(os.path.join('test-cache-project', Project.__mime_cache_name__))
+
+        # a newly loaded project uses the cache instead of parsing the unchanged descriptor again
+        project = Project.load_project('test-cache-project', workspace=ws)
+        with patch.object(Project, '_yaml_mime_type', autospec=True) as m_detect:
+            assert project.mime_type(nsd_path) == 'application/vnd.5gtango.nsd'
+            assert m_detect.call_count == 0
+
+        # changed files are detected again
+        with open(nsd_path, 'a') as f:
+            f.write('\n# changed\n')
+        assert project.mime_type(nsd_path) == 'application/vnd.5gtango.nsd'
+        assert project._mime_cache['nsd.yml'][0] == os.stat(nsd_path).st_size
+        shutil.rmtree('test-cache-project')
+
+    # descriptor types are detected from the top-level keys without parsing the whole file
+    def test_sniff_yaml_keys(self, workspace, tmpdir):
+        # parsing stops at descriptor_schema, so the invalid rest of the file is never read
+        vnfd = tmpdir.join('vnfd.yml')
+        vnfd.write('descriptor_schema: https://example.com/vnfd-schema.yml\nname: [unclosed\n')
+        assert Project._sniff_yaml_keys(str(vnfd)) == {'descriptor_schema': 'https://example.com/vnfd-schema.yml'}
+
+        # nested values are skipped; only top-level keys are returned
+        nsd = tmpdir.join('nsd.yml')
+        nsd.write('id: nsd\nconstituent-vnfd:\n  - member-vnf-index: 0\nvld:\n  - id: mgmt\n')
+        assert list(Project._sniff_yaml_keys(str(nsd))) == ['id', 'constituent-vnfd', 'vld']
+
+        # merge keys are ambiguous -> fall back to parsing the full file
+        merged = tmpdir.join('merged.yml')
+        merged.write('base: &base\n  vnfd-catalog: {}\n<<: *base\n')
+        assert Project._sniff_yaml_keys(str(merged)) is None
+        project = Project(Workspace.load_workspace(workspace), str(tmpdir))
+        assert project.mime_type(str(merged)) == 'application/vnd.etsi.osm.vnfd'
+
+    # MIME types detected in a thread or process pool are added in the same order as sequentially
+    @pytest.mark.parametrize('pool', ['thread', 'process'])
+    def test_parallel_add_files(self, workspace, tmpdir, pool):
+        ws = Workspace.load_workspace(workspace)
+        for f in ['osm_nsd.yml', 'osm_vnfd0.yml', 'tango_nsd.yml', 'tango_vnfd0.yml']:
+            shutil.copy(os.path.join('example-project', f), str(tmpdir))
+        tmpdir.join('readme.txt').write('sample text')
+        files = [str(tmpdir.join(f)) for f in ['tango_vnfd0.yml', 'readme.txt', 'osm_nsd.yml',
+                                               'tango_nsd.yml', 'osm_vnfd0.yml', 'missing.yml']]
+
+        sequential = Project(ws, str(tmpdir)).mime_types(files)
+        project = Project(ws, str(tmpdir), jobs=2, pool=pool)
+        assert project.mime_types(files) == sequential
+        assert sequential[-1] == -1
+
+        with patch.object(Project, '_write_prj_yml', autospec=True):
+            project.add_files(files)
+        paths = [f['path'] for f in project.project_config['files']]
+        assert paths == ['tango_vnfd0.yml', 'readme.txt', 'osm_nsd.yml', 'tango_nsd.yml', 'osm_vnfd0.yml']
+
+    # cached projects are reused until project.yml is modified; concurrent loads are coalesced
+    def test_project_cache(self, workspace, tmpdir):
+        ws = Workspace.load_workspace(workspace)
+        roots = [str(tmpdir.join('project{}'.format(i))) for i in range(3)]
+        for root in roots:
+            os.makedirs(root)
+            Project(ws, root)._write_prj_yml()
+
+        loads = []
+
+        def loader(prj_root):
+            loads.append(prj_root)
+            time.sleep(0.1)
+            return Project.load_project(prj_root, workspace=ws)
+
+        def use(key, root):
+            with cache.project(key, root) as project:
+                assert project is not None
+
+        cache = ProjectCache(maxsize=2, loader=loader)
+        threads = [threading.Thread(target=use, args=('p0', roots[0])) for _ in range(4)]
+        with cache.project('p0', roots[0]) as project:
+            for t in threads:
+                t.start()
+            # changes of the cached project itself keep it valid
+            tmpdir.join('project0', 'file.txt').write('text')
+            project.add_file(str(tmpdir.join('project0', 'file.txt')))
+        for t in threads:
+            t.join()
+        assert loads == [roots[0]]
+        assert cache.stats()['hits'] == 4
+
+        # external changes of project.yml invalidate the cached project
+        external = Project.load_project(roots[0], workspace=ws)
+        external.remove_file(str(tmpdir.join('project0', 'file.txt')))
+        with cache.project('p0', roots[0]) as project:
+            assert project is not external and project.project_config['files'] == []
+        assert len(loads) == 2
+
+        # least recently used projects are evicted
+        for key, root in [('p1', roots[1]), ('p2', roots[2]), ('p0', roots[0])]:
+            use(key, root)
+        assert loads[2:] == [roots[1], roots[2], roots[0]]
+        assert cache.stats()['size'] == 2
+        with cache.project('missing', str(tmpdir.join('missing'))) as project:
+            assert project is None
+
+    # loading a project doesn't create the lock file (eg, in read-only checkouts); only changing it does
+    def test_load_without_lock_file(self, workspace, example_project):
+        ws = Workspace.load_workspace(workspace)
+        lock_path = os.path.join(example_project, Project.__lock_name__)
+        os.chmod(example_project, 0o555)
+        try:
+            project = Project.load_project(example_project, workspace=ws)
+        finally:
+            os.chmod(example_project, 0o755)
+        assert not os.path.exists(lock_path)
+        project.remove_file(os.path.join(example_project, 'osm_nsd.yml'))
+        assert os.path.exists(lock_path)
+        assert Project.load_project(example_project, workspace=ws).get_nsds(type='application/vnd.etsi.osm.nsd') == []
+
+    # concurrent changes of project.yml by different project objects or processes are not lost
+    def test_concurrent_changes(self, workspace, tmpdir):
+        ws = Workspace.load_workspace(workspace)
+        root = str(tmpdir.join('project'))
+        os.makedirs(root)
+        Project(ws, root)._write_prj_yml()
+        for i in range(8):
+            tmpdir.join('project', 'file{}.txt'.format(i)).write('text')
+
+        # both projects are loaded before either adds a file
+        project1 = Project.load_project(root, workspace=ws)
+        project2 = Project.load_project(root, workspace=ws)
+        project1.add_file(os.path.join(root, 'file0.txt'))
+        project2.add_file(os.path.join(root, 'file1.txt'))
+        project1.remove_file(os.path.join(root, 'file0.txt'))
+        assert [f['path'] for f in Project.load_project(root, workspace=ws).project_config['files']] == ['file1.txt']
+
+        with multiprocessing.Pool(3) as pool:
+            pool.starmap(_add_file, [(workspace, root, 'file{}.txt'.format(i)) for i in range(2, 8)])
+        paths = [f['path'] for f in Project.load_project(root, workspace=ws).project_config['files']]
+        assert sorted(paths) == ['file{}.txt'.format(i) for i in range(1, 8)]
+        assert not [f for f in os.listdir(root) if f.endswith('.tmp')]
+
+    # jobs run in worker processes and save their status; too many pending jobs are rejected
+    # without mp_context (Python 3.6) jobs run in threads instead of forked processes
+    @pytest.mark.parametrize('mp_context', [True, False])
+    def test_job_queue(self, tmpdir, monkeypatch, mp_context):
+        if not mp_context:
+            process_pool = jobs.ProcessPoolExecutor
+            monkeypatch.setattr(jobs, 'ProcessPoolExecutor', lambda max_workers=None: process_pool(max_workers))
+        job_dir = str(tmpdir.join('jobs'))
+        queue = JobQueue(max_workers=1, max_queued=1)
+        job1 = queue.submit(job_dir, _sleep_job, 0.5)
+        job2 = queue.submit(job_dir, _sleep_job, 0, 'raise')
+        assert queue.depth == 2
+        with pytest.raises(QueueFull):
+            queue.submit(job_dir, _sleep_job, 0)
+        assert jobs.load_job(job_dir, job2)['status'] == 'queued'
+        assert jobs.load_job(job_dir, '../' + job1) is None
+
+        queue.shutdown()
+        assert queue.depth == 0
+        status1 = jobs.load_job(job_dir, job1)
+        assert status1['status'] == 'done' and status1['duration'] == 0.5 and status1['finished']
+        status2 = jobs.load_job(job_dir, job2)
+        assert status2['status'] == 'failed' and status2['error_msg'] == 'job failed'
+
+    # the zip archive contains project.yml and the files in the manifest and is generated in small chunks
+    @pytest.mark.parametrize('compresslevel', [0, 6])
+    def test_zip_stream(self, workspace, tmpdir, compresslevel):
+        ws = Workspace.load_workspace(workspace)
+        root = str(tmpdir.join('project'))
+        os.makedirs(root)
+        tmpdir.join('project', 'large.txt').write('text' * (1 << 20))
+        tmpdir.join('project', 'image.qcow2').write_binary(os.urandom(1 << 16))
+        tmpdir.join('project', 'other.txt').write('not in project.yml')
+        project = Project(ws, root)
+        project.add_files([os.path.join(root, 'large.txt'), os.path.join(root, 'image.qcow2')])
+
+        chunks = list(project.zip_stream(prefix='p/', compresslevel=compresslevel))
+        assert max(len(c) for c in chunks) <= 2 * (1 << 16)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            assert archive.namelist() == ['p/project.yml', 'p/large.txt', 'p/image.qcow2']
+            assert archive.read('p/large.txt') == b'text' * (1 << 20)
+            types = [info.compress_type for info in archive.infolist()]
+        if compresslevel:
+            assert types == [zipfile.ZIP_DEFLATED, zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]
+        else:
+            assert types == [zipfile.ZIP_STORED] * 3
+
+    # list files filtered by type, tag, and path pattern in pages
+    def test_list_files(self, workspace, example_project):
+        project = Project.load_project(example_project, workspace=Workspace.load_workspace(workspace))
+        files, cursor = project.list_files()
+        assert files == project.project_config['files'] and cursor is None
+
+        pages = []
+        cursor = None
+        while True:
+            files, cursor = project.list_files(name='*.yml', limit=2, after=cursor)
+            pages.append([f['path'] for f in files])
+            if cursor is None:
+                break
+        yml_files = [f['path'] for f in project.project_config['files'] if f['path'].endswith('.yml')]
+        assert [p for page in pages for p in page] == yml_files and all(len(page) <= 2 for page in pages)
+
+        files, cursor = project.list_files(type='application/vnd.5gtango.vnfd', tag='eu.5gtango')
+        assert [f['path'] for f in files] == ['tango_vnfd0.yml']
+        assert project.list_files(tag='etsi.osm', name='*nsd*')[0][0]['path'] == 'osm_nsd.yml'
+        with pytest.raises(ValueError):
+            project.list_files(type='application/vnd.5gtango.vnfd', after='osm_nsd.yml')
+
+        # cursor positions are updated when files are removed
+        paths = [f['path'] for f in project.list_files()[0]]
+        assert [f['path'] for f in project.list_files(after=paths[0], limit=1)[0]] == [paths[1]]
+        with patch.object(Project, '_write_prj_yml', autospec=True):
+            project.remove_file(os.path.join(example_project, paths[1]))
+        assert [f['path'] for f in project.list_files(after=paths[0], limit=1)[0]] == [paths[2]]
+
+    # the project index lists project folders in pages and is only rebuilt when projects are added or removed
+    def test_project_index(self, tmpdir):
+        for name in ['c', 'a', 'b2', 'b1']:
+            tmpdir.mkdir(name)
+        tmpdir.join('file.txt').write('not a project')
+        index = ProjectIndex(str(tmpdir))
+        assert index.list() == (['a', 'b1', 'b2', 'c'], None)
+        assert index.list(limit=2) == (['a', 'b1'], 'b1')
+        assert index.list(limit=2, after='b1') == (['b2', 'c'], None)
+        assert index.list(name='b*', limit=1) == (['b1'], 'b1')
+
+        names = index.names()
+        assert index.names() is names
+        shutil.rmtree(str(tmpdir.join('a')))
+        assert index.list(after='a') == (['b1', 'b2', 'c'], None)
+
+    # uploaded and extracted files stay inside the project and don't overwrite its metadata
+    def test_extract_archive(self, tmpdir):
+        root = str(tmpdir)
+        assert upload_path(root, 'sources/a.yml') == os.path.join(root, 'sources', 'a.yml')
+        for invalid in ['', '/etc/passwd', '../a.yml', 'sources/../../a.yml', 'project.yml', './.project.lock',
+                        '.package_jobs/0123.json', 'sources/.upload.abc.tmp']:
+            assert upload_path(root, invalid) is None
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as archive:
+            archive.writestr('sources/a.yml', 'a: 1')
+            archive.writestr('../evil.txt', 'evil')
+        results = extract_archive(buf, root)
+        assert [(name, error) for name, _, error in results] == \
+            [('sources/a.yml', None), ('../evil.txt', 'Invalid path')]
+        assert tmpdir.join('sources', 'a.yml').read() == 'a: 1' and not tmpdir.dirpath().join('evil.txt').exists()
+
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode='w:gz') as archive:
+            info = tarfile.TarInfo('b.txt')
+            info.size = 1
+            archive.addfile(info, io.BytesIO(b'b'))
+            link = tarfile.TarInfo('link')
+            link.type = tarfile.SYMTYPE
+            link.linkname = '/etc/passwd'
+            archive.addfile(link)
+        results = extract_archive(buf, root)
+        assert [(name, error) for name, _, error in results] == [('b.txt', None), ('link', 'Not a regular file')]
+        assert not tmpdir.join('link').exists()
+        with pytest.raises(ValueError):
+            extract_archive(io.BytesIO(b'no archive'), root)
+
+        # archives with too many or too large files (eg, zip bombs) are rejected before extracting anything
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('bomb1.txt', b'0' * 100000)
+            archive.writestr('bomb2.txt', b'0' * 100000)
+        with pytest.raises(ValueError):
+            extract_archive(buf, root, max_size=150000)
+        with pytest.raises(ValueError):
+            extract_archive(buf, root, max_files=1)
+        assert not tmpdir.join('bomb1.txt').exists()
+        assert len(extract_archive(buf, root, max_size=200000, max_files=2)) == 2
+
+        # archives with wrong sizes in their headers are checked while extracting; the project remains unchanged
+        tmpdir.join('c.txt').write('old')
+        members = [('c.txt', b'c' * 10, 0, False), ('d.txt', b'd' * 10, 0, False)]
+        with pytest.raises(ValueError):
+            _extract_members(root, io.BytesIO, members, max_size=15, max_files=None)
+        assert tmpdir.join('c.txt').read() == 'old' and not tmpdir.join('d.txt').exists()
+        assert not glob.glob(os.path.join(root, '.upload.*'))
+
+    # uploads into a project behind a symlink (eg, a Docker volume) are added relative to the project
+    def test_upload_path_symlink(self, workspace, tmpdir):
+        ws = Workspace.load_workspace(workspace)
+        tmpdir.mkdir('data').mkdir('project')
+        tmpdir.join('projects').mksymlinkto(tmpdir.join('data'))
+        tmpdir.join('data', 'outside.txt').write('outside')
+        tmpdir.join('data', 'project', 'link').mksymlinkto(tmpdir.join('data'))
+        root = str(tmpdir.join('projects', 'project'))
+        project = Project(ws, root)
+
+        path = upload_path(root, 'sources/a.yml')
+        assert path == os.path.join(root, 'sources', 'a.yml')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('a: 1')
+        project.add_files([path])
+        assert [f['path'] for f in project.project_config['files']] == ['sources/a.yml']
+        assert upload_path(root, 'link/outside.txt') is None
+
+    # request metrics count requests per endpoint and status class in cumulative latency histograms
+    def test_request_metrics(self):
+        metrics = RequestMetrics(buckets=(0.1, 1))
+        start = metrics.start()
+        assert metrics.snapshot()['in_flight'] == 1
+        metrics.finish('GET /projects', 200, start)
+        metrics.finish('GET /projects', 404, metrics.start() - 0.5)
+        snapshot = metrics.snapshot()
+        assert snapshot['in_flight'] == 0 and snapshot['uptime'] >= 0
+        projects = snapshot['endpoints']['GET /projects']
+        assert projects['requests'] == 2 and projects['status'] == {'2xx': 1, '4xx': 1}
+        assert projects['latency_buckets'] == {'0.1': 1, '1': 2, '+Inf': 2} and projects['latency_sum'] >= 0.5
+
+        # Prometheus text format
+        text = metrics.exposition([('cache_hits_total', 'counter', 'Cache hits.', 3)])
+        assert '# TYPE tngproject_request_duration_seconds histogram' in text.splitlines()
+        assert 'tngproject_requests_total{endpoint="GET /projects",status="4xx"} 1' in text.splitlines()
+        assert 'tngproject_request_duration_seconds_bucket{endpoint="GET /projects",le="+Inf"} 2' in text.splitlines()
+        assert 'tngproject_request_duration_seconds_count{endpoint="GET /projects"} 2' in text.splitlines()
+        assert 'tngproject_cache_hits_total 3' in text.splitlines() and text.endswith('\n')
+
+        # a forked worker process starts over
+        metrics.reset()
+        assert metrics.snapshot()['endpoints'] == {} and metrics.uptime() < 1
+
+
+# load a project and add a file in a separate process (for test_concurrent_changes)
+def _add_file(ws_root, prj_root, file_name):
+    project = Project.load_project(prj_root, workspace=Workspace.load_workspace(ws_root))
+    time.sleep(0.05)
+    project.add_file(os.path.join(prj_root, file_name))
+
+
+# job for test_job_queue (executed in a worker process)
+def _sleep_job(duration, error_msg=None):
+    time.sleep(duration)
+    if error_msg == 'raise':
+        raise ValueError('job failed')
+    return {'duration': duration, 'error_msg': error_msg}
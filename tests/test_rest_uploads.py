@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2015 SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, UBIWHERE, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+import os
+import io
+import glob
+import hashlib
+import pytest
+from tngsdk import rest
+
+
+class TestRestUploads:
+
+    # test client of the REST API serving projects from a temporary folder; yields (client, project UUID)
+    @pytest.fixture
+    def project(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(str(tmpdir))
+        client = rest.app.test_client()
+        response = client.post('/api/v1/projects', data={'vnfs': 1}, buffered=True)
+        assert response.status_code == 200
+        yield client, response.get_json()['uuid']
+
+    # uploads are streamed into the project and hashed on the fly; no temp files remain
+    def test_upload_hash(self, project):
+        client, uuid = project
+        content = os.urandom(1024 * 1024)
+        response = client.post('/api/v1/projects/{}/files'.format(uuid), buffered=True,
+                               data={'file': (io.BytesIO(content), 'image.qcow2')})
+        assert response.status_code == 200
+        assert response.get_json()['sha256'] == hashlib.sha256(content).hexdigest()
+        with open(os.path.join('projects', uuid, 'image.qcow2'), 'rb') as f:
+            assert f.read() == content
+        assert not glob.glob(os.path.join('projects', uuid, '.upload.*'))
+
+    # file names outside the project are rejected
+    def test_upload_invalid_path(self, project):
+        client, uuid = project
+        for filename in ['../evil.txt', '/tmp/evil.txt', 'project.yml']:
+            response = client.post('/api/v1/projects/{}/files'.format(uuid), buffered=True,
+                                   data={'file': (io.BytesIO(b'evil'), filename)})
+            assert response.status_code == 400
+        assert not os.path.exists(os.path.join('projects', 'evil.txt'))
+        assert not glob.glob(os.path.join('projects', uuid, '.upload.*'))
+
+    # files cannot replace existing directories, neither in single nor in bulk uploads
+    def test_upload_directory(self, project):
+        client, uuid = project
+        os.makedirs(os.path.join('projects', uuid, 'images'))
+        response = client.post('/api/v1/projects/{}/files'.format(uuid), buffered=True,
+                               data={'file': (io.BytesIO(b'image'), 'images')})
+        assert response.status_code == 400
+        response = client.post('/api/v1/projects/{}/files/bulk'.format(uuid), buffered=True,
+                               data={'files': [(io.BytesIO(b'image'), 'images/')]})
+        assert response.status_code == 200
+        assert response.get_json()['files'][0]['error_msg'] == 'Invalid path'
+        assert os.path.isdir(os.path.join('projects', uuid, 'images'))
+        assert not glob.glob(os.path.join('projects', uuid, '.upload.*'))
+
+    # the project's internal files are not served, unlike project.yml and uploaded files
+    def test_get_internal_files(self, project):
+        client, uuid = project
+        response = client.post('/api/v1/projects/{}/files'.format(uuid), buffered=True,
+                               data={'file': (io.BytesIO(b'text'), 'file.txt')})
+        assert response.status_code == 200
+        open(os.path.join('projects', uuid, '.upload.abc.tmp'), 'w').close()
+        for filename in ['.mime_cache.json', '.project.lock', '.package_jobs', '.upload.abc.tmp']:
+            response = client.get('/api/v1/projects/{}/{}'.format(uuid, filename), buffered=True)
+            assert response.status_code == 404
+        for filename in ['project.yml', 'file.txt']:
+            response = client.get('/api/v1/projects/{}/{}'.format(uuid, filename), buffered=True)
+            assert response.status_code == 200
+            response.close()
+
+    # uploads exceeding the max. size are rejected with 413 and their temp files are removed
+    def test_upload_max_size(self, project, monkeypatch):
+        client, uuid = project
+        monkeypatch.setattr(rest, 'UPLOAD_MAX_SIZE', 1000)
+        response = client.post('/api/v1/projects/{}/files'.format(uuid), buffered=True,
+                               data={'file': (io.BytesIO(b'0' * 100000), 'large.txt')})
+        assert response.status_code == 413
+        assert not os.path.exists(os.path.join('projects', uuid, 'large.txt'))
+        assert not glob.glob(os.path.join('projects', uuid, '.upload.*'))
+
+        response = client.post('/api/v1/projects/{}/files/bulk'.format(uuid), buffered=True,
+                               data={'files': [(io.BytesIO(b'small'), 'small.txt'),
+                                               (io.BytesIO(b'0' * 100000), 'large.txt')]})
+        assert response.status_code == 413
+        assert not os.path.exists(os.path.join('projects', uuid, 'small.txt'))
+        assert not glob.glob(os.path.join('projects', uuid, '.upload.*'))
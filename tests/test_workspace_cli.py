@@ -33,8 +33,11 @@
 # partner consortium (www.5gtango.eu).
 
 import os
+import shutil
+import tempfile
 import unittest
-from tngsdk.project.workspace import Workspace
+import yaml
+from tngsdk.project.workspace import Workspace, create_workspace
 from unittest.mock import patch
 from unittest import mock
 
@@ -124,7 +127,7 @@ class CreateWorkspaceTests(unittest.TestCase):
 
         # Feed this descriptor as a config file
         # by patching os.open and yaml.load methods
-        m_open.return_value = None
+        m_open.return_value = mock.MagicMock()
         m_yaml.load.return_value = conf_d
 
         # Ensure it raises error when loading incomplete config descriptor
@@ -155,7 +158,7 @@ class CreateWorkspaceTests(unittest.TestCase):
                        log_level='log_level')
 
         # Patch file handling functions
-        m_open.return_value = None
+        m_open.return_value = mock.MagicMock()
         m_open.write.return_value = None
         m_yaml.dump.return_value = None
 
@@ -181,3 +184,35 @@ class CreateWorkspaceTests(unittest.TestCase):
 
         # Assert returned workspace configuration is equal to the previous
         self.assertEqual(ws, new_ws)
+
+    def test_load_workspace_cache(self):
+        """
+        Verify that loaded workspaces are cached until
+        workspace.yml changes and that old configurations
+        are updated and saved only once.
+        """
+        tmp = tempfile.mkdtemp()
+        try:
+            ws_root = os.path.join(tmp, 'ws')
+            create_workspace(ws_root)
+            ws = Workspace.load_workspace(ws_root)
+            self.assertIs(Workspace.load_workspace(ws_root), ws)
+            self.assertIs(ws.type_mapping, Workspace.load_workspace(ws_root).type_mapping)
+
+            # store an old configuration version -> reloaded and updated
+            ws_file = os.path.join(ws_root, Workspace.__descriptor_name__)
+            config = ws.config.copy()
+            config['version'] = '0.04'
+            with open(ws_file, 'w') as f:
+                yaml.dump(config, f, default_flow_style=False)
+            new_ws = Workspace.load_workspace(ws_root)
+            self.assertIsNot(new_ws, ws)
+            self.assertEqual(new_ws.config['version'], Workspace.CONFIG_VERSION)
+
+            # the updated configuration was saved
+            with open(ws_file, 'r') as f:
+                self.assertEqual(yaml.safe_load(f)['version'], Workspace.CONFIG_VERSION)
+            self.assertIs(Workspace.load_workspace(ws_root), new_ws)
+        finally:
+            Workspace.clear_cache()
+            shutil.rmtree(tmp)